@@ -42,7 +42,7 @@ export default function Home() {
   const [youtubeUrl, setYoutubeUrl] = useState('');
   const [isProcessing, setIsProcessing] = useState(false);
   const [hasResults, setHasResults] = useState(false);
-  const [transcript, setTranscript] = useState('');
+  const [transcriptId, setTranscriptId] = useState('');
   const [error, setError] = useState('');
   const [summary, setSummary] = useState('');
   const [mcqs, setMcqs] = useState<any[]>([]);
@@ -161,14 +161,14 @@ const handleSubmit = async (e: React.FormEvent) => {
       setIsProcessing(false);
       return;
     }
-    setTranscript(data.transcript || '');
+    setTranscriptId(data.transcript_id || '');
     setSummary(data.summary || '');
 
     // 2) Get MCQs + flashcards
     const mcqFlashRes = await fetch(`${base}/mcq-flashcards`, {
       method: 'POST',
       headers,
-      body: JSON.stringify({ video_id: videoId }),
+      body: JSON.stringify({ video_id: videoId, transcript_id: data.transcript_id }),
     });
     const mcqFlashData = await mcqFlashRes.json();
     if (mcqFlashData.error) {
@@ -190,7 +190,7 @@ const handleSubmit = async (e: React.FormEvent) => {
 
 
   if (hasResults) {
-    return <ResultsView summary={summary} transcript={transcript} mcqs={mcqs} flashcards={flashcards}/>;
+    return <ResultsView summary={summary} transcriptId={transcriptId} mcqs={mcqs} flashcards={flashcards}/>;
   }
 
   return (
@@ -325,7 +325,7 @@ const handleSubmit = async (e: React.FormEvent) => {
   );
 }
 
-function ResultsView({summary, transcript, mcqs,flashcards}: {summary: string, transcript: string, mcqs: any[], flashcards: any[]}) {
+function ResultsView({summary, transcriptId, mcqs,flashcards}: {summary: string, transcriptId: string, mcqs: any[], flashcards: any[]}) {
   const [currentMCQ, setCurrentMCQ] = useState(0);
   const [selectedAnswer, setSelectedAnswer] = useState<number | null>(null);
   const [showExplanation, setShowExplanation] = useState(false);
@@ -578,8 +578,7 @@ function ResultsView({summary, transcript, mcqs,flashcards}: {summary: string, t
     </div>
     <Separator />
      {/* TODO: Implement RAGQuery or import it if available */}
-     {/* <RAGQuery transcript={transcript} /> */}
-     <RAGQuery transcript={transcript} />
+     <RAGQuery transcriptId={transcriptId} />
   </div>
 </CardContent>
                 </Card>
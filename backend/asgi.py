@@ -0,0 +1,317 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    # Optional: maintained replacement for Starlette's deprecated WSGI adapter
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import app as wsgi  # the Flask app: same routes, jobs queue, error mapping
+import metrics
+import usage
+from auth import validate_supabase_token
+from compression import encode_body
+from config import ASGI_PIPELINE_WORKERS, ASGI_CPU_WORKERS, QUIZ_MODE
+from llm_scheduler import INTERACTIVE, BULK, llm_priority
+from pipeline import summarize_video, quiz_for_video
+from rag import VideoNotIndexed, answer_query
+
+# Async serving mode: `uvicorn asgi:app --port 5000` (or `python asgi.py`).
+#
+# The slow routes (/transcript, /mcq-flashcards, their streams and /rag) are
+# served on the event loop: a waiting request, an idle SSE stream or a
+# request waiting on someone else's identical run holds no thread. Only the
+# blocking pipeline itself (YouTube, Together, vector store writes) runs on
+# a bounded executor, and RAG's CPU-bound embedding + generation on another.
+# Every other route (jobs, stats, metrics, auth, payments) is the Flask app,
+# mounted as WSGI.
+#
+# What this mode does not do: the pipeline is synchronous code, so a run
+# holds one ASGI_PIPELINE_WORKERS thread from start to finish, including
+# its waits on YouTube and Together. At most ASGI_PIPELINE_WORKERS distinct
+# videos are processed at once; further runs queue (without holding a
+# thread) until one finishes. The gain over WSGI is in everything around
+# the runs: queued and coalesced requests and SSE streams cost no thread.
+
+log = logging.getLogger(__name__)
+
+_pipeline = ThreadPoolExecutor(ASGI_PIPELINE_WORKERS, thread_name_prefix="asgi-pipeline")
+_cpu = ThreadPoolExecutor(ASGI_CPU_WORKERS, thread_name_prefix="asgi-cpu")
+
+# (endpoint, video_id, settings) -> the run concurrent identical requests await
+_flights = {}
+# Stream workers, referenced until they finish
+_background = set()
+
+
+async def _offload(executor, fn, *args, **kwargs):
+    """
+    Run blocking `fn` on `executor` (None: the loop's default one, for quick
+    lookups that shouldn't queue behind pipeline runs) with this task's
+    contextvars (usage user, LLM priority).
+    """
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+def _forget(key, future):
+    if _flights.get(key) is future:
+        del _flights[key]
+    if not future.cancelled():
+        future.exception()  # retrieved even if every waiter went away
+
+
+async def _shared(key, fn):
+    """
+    One pipeline run for all concurrent requests with the same key; a
+    disconnecting client doesn't cancel it. As with pipeline_flights, each
+    caller passes usage admission before joining, only the leader's user is
+    billed, and a run refused for the leader's quota is run again by the
+    others.
+    """
+    await _offload(None, usage.store.check)
+    while True:
+        future = _flights.get(key)
+        leader = future is None or future.done()
+        if leader:
+            future = asyncio.ensure_future(_offload(_pipeline, fn))
+            _flights[key] = future
+            future.add_done_callback(functools.partial(_forget, key))
+        try:
+            return await asyncio.shield(future)
+        except usage.QuotaExceeded:
+            if leader:
+                raise
+
+
+def _json(request, payload, status=200):
+    # Same encoding as the Flask after_request hook
+    body = json.dumps(payload).encode("utf-8")
+    coding, body = encode_body(body, request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(body, status_code=status, media_type="application/json", headers=headers)
+
+
+def _error(request, e):
+    payload, status = wsgi._error_payload(e)
+    return _json(request, payload, status)
+
+
+async def _body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def _current_user(request):
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    # Usually a local signature check; the Supabase fallback is a network call
+    return await _offload(None, validate_supabase_token, auth.split(" ", 1)[1].strip())
+
+
+def _unauthorized(request):
+    return _json(request, {"error": "unauthorized", "message": "Please sign in to use this endpoint."}, 401)
+
+
+def _stream(run):
+    """
+    Async twin of app._stream: `run(progress)` goes to the pipeline executor
+    and its progress events are relayed as Server-Sent Events by the event
+    loop, so an open stream holds no request thread.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def progress(event, **data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def worker():
+        try:
+            events.put_nowait(("done", await _offload(_pipeline, run, progress)))
+        except Exception as e:
+            log.exception("streamed request failed")
+            payload, status = wsgi._error_payload(e)
+            events.put_nowait(("error", dict(payload, status=status)))
+
+    task = asyncio.ensure_future(worker())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+    async def generate():
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), timeout=15)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield wsgi._sse(event, data)
+            if event in ("done", "error"):
+                break
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def transcript(request):
+    user = await _current_user(request)
+    if user is None:
+        return _unauthorized(request)
+
+    data = await _body(request)
+    video_id = data.get('video_id')
+    refresh = bool(data.get('refresh', False))
+    include_transcript = bool(data.get('include_transcript', False))
+    try:
+        with llm_priority(INTERACTIVE), usage.as_user(user.get('id')):
+            result = await _shared(
+                ('summary', video_id, refresh, include_transcript),
+                lambda: summarize_video(video_id, refresh=refresh, include_transcript=include_transcript),
+            )
+        return _json(request, result)
+    except Exception as e:
+        return _error(request, e)
+
+
+async def transcript_stream(request):
+    user = await _current_user(request)
+    if user is None:
+        return _unauthorized(request)
+
+    data = await _body(request)
+    video_id = data.get('video_id')
+    refresh = bool(data.get('refresh', False))
+    include_transcript = bool(data.get('include_transcript', False))
+    with llm_priority(INTERACTIVE), usage.as_user(user.get('id')):
+        return _stream(lambda progress: summarize_video(
+            video_id, refresh=refresh, progress=progress, include_transcript=include_transcript))
+
+
+async def mcq_flashcards(request):
+    user = await _current_user(request)
+    if user is None:
+        return _unauthorized(request)
+
+    data = await _body(request)
+    video_id = await _offload(None, wsgi._requested_video_id, data)
+    if video_id is None:
+        return _json(request, {'error': 'video_id or a valid transcript_id is required'}, 400)
+    refresh = bool(data.get('refresh', False))
+    mode = data.get('mode', QUIZ_MODE)
+    try:
+        with llm_priority(BULK), usage.as_user(user.get('id')):
+            result = await _shared(
+                ('quiz', video_id, refresh, mode),
+                lambda: quiz_for_video(video_id, refresh=refresh, mode=mode),
+            )
+        return _json(request, result)
+    except Exception as e:
+        log.exception("mcq-flashcards failed", extra={"video_id": video_id})
+        return _error(request, e)
+
+
+async def mcq_flashcards_stream(request):
+    user = await _current_user(request)
+    if user is None:
+        return _unauthorized(request)
+
+    data = await _body(request)
+    video_id = await _offload(None, wsgi._requested_video_id, data)
+    if video_id is None:
+        return _json(request, {'error': 'video_id or a valid transcript_id is required'}, 400)
+    refresh = bool(data.get('refresh', False))
+    mode = data.get('mode', QUIZ_MODE)
+    with llm_priority(BULK), usage.as_user(user.get('id')):
+        return _stream(lambda progress: quiz_for_video(video_id, refresh=refresh, mode=mode, progress=progress))
+
+
+async def rag_endpoint(request):
+    data = await _body(request)
+    transcript = data.get('transcript')
+    query = data.get('query')
+    video_id = await _offload(None, wsgi._requested_video_id, data)
+    if not (transcript or video_id) or not query:
+        return _json(request, {
+            'error': 'query and either video_id, a valid transcript_id or transcript are required'}, 400)
+
+    try:
+        # Embedding and flan-t5 generation are CPU-bound: their own executor
+        with llm_priority(INTERACTIVE):
+            result, sources = await _offload(
+                _cpu, answer_query, query, transcript_text=transcript, video_id=video_id)
+        return _json(request, {'answer': result})
+    except VideoNotIndexed as e:
+        return _json(request, {'error': 'not_found', 'message': str(e)}, 404)
+    except Exception as e:
+        return _json(request, {'error': str(e)}, 500)
+
+
+def _route(path, endpoint):
+    """A native route with the Flask app's CORS policy and HTTP latency metric."""
+    async def observed(request):
+        if request.method == 'OPTIONS':
+            return Response(status_code=200)
+        started = time.perf_counter()
+        response = await endpoint(request)
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - started, method=request.method, endpoint=path, status=response.status_code)
+        return response
+
+    cors = Middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return Route(path, observed, methods=["POST", "OPTIONS"], middleware=[cors])
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(_):
+    wsgi.jobs.start()
+    yield
+    _pipeline.shutdown(wait=False, cancel_futures=True)
+    _cpu.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        _route('/transcript', transcript),
+        _route('/transcript/stream', transcript_stream),
+        _route('/mcq-flashcards', mcq_flashcards),
+        _route('/mcq-flashcards/stream', mcq_flashcards_stream),
+        _route('/rag', rag_endpoint),
+        # Everything else: the Flask routes, as they are
+        Mount('/', app=WSGIMiddleware(wsgi.app)),
+    ],
+    lifespan=_lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,266 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+
+import http_clients
+from config import (
+    SUPABASE_URL,
+    SUPABASE_ANON_KEY,
+    SUPABASE_JWT_SECRET,
+    SUPABASE_JWKS_URL,
+    SUPABASE_JWT_AUDIENCE,
+    AUTH_RECHECK_SECONDS,
+)
+
+try:
+    # Only needed for asymmetric (JWKS) Supabase signing keys
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
+
+log = logging.getLogger(__name__)
+
+LEEWAY_SECONDS = 30
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64url_decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64url_encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def mint_token(claims, secret=None):
+    """
+    Sign `claims` as an HS256 JWT. Handy for exercising the auth path
+    offline with locally minted tokens.
+    """
+    secret = secret or SUPABASE_JWT_SECRET
+    header = _b64url_encode(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64url_encode(json.dumps(claims).encode())
+    signing_input = f"{header}.{payload}".encode("ascii")
+    signature = hmac.new(secret.encode(), signing_input, hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64url_encode(signature)}"
+
+
+def _check_claims(claims):
+    now = time.time()
+    if "exp" not in claims or claims["exp"] + LEEWAY_SECONDS < now:
+        raise InvalidToken("token expired")
+    if claims.get("nbf", 0) - LEEWAY_SECONDS > now:
+        raise InvalidToken("token not yet valid")
+    if SUPABASE_JWT_AUDIENCE:
+        aud = claims.get("aud")
+        auds = aud if isinstance(aud, list) else [aud]
+        if SUPABASE_JWT_AUDIENCE not in auds:
+            raise InvalidToken("wrong audience")
+    return claims
+
+
+def _verify_hs256(token, secret):
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64url_decode(header_b64))
+        claims = json.loads(_b64url_decode(payload_b64))
+        signature = _b64url_decode(signature_b64)
+    except Exception:
+        raise InvalidToken("malformed token")
+    if header.get("alg") != "HS256":
+        raise InvalidToken(f"unexpected alg {header.get('alg')}")
+    expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode("ascii"), hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise InvalidToken("bad signature")
+    return _check_claims(claims)
+
+
+# Supabase's signing keys: refetched hourly, or (at most once a minute) when
+# a token names a key id we don't have yet, i.e. after a key rotation
+JWKS_LIFESPAN_SECONDS = 3600
+JWKS_MIN_REFETCH_SECONDS = 60
+_jwks = None
+_jwks_fetched_at = 0.0
+_jwks_lock = threading.Lock()
+
+
+def _fetch_jwks():
+    # Through the pooled Supabase session (timeouts, retries), not PyJWT's own urllib call
+    resp = http_clients.supabase.get(SUPABASE_JWKS_URL)
+    resp.raise_for_status()
+    return pyjwt.PyJWKSet.from_dict(resp.json())
+
+
+def _signing_key(kid):
+    global _jwks, _jwks_fetched_at
+    with _jwks_lock:
+        now = time.time()
+        if _jwks is None or now - _jwks_fetched_at > JWKS_LIFESPAN_SECONDS:
+            _jwks, _jwks_fetched_at = _fetch_jwks(), now
+        key = _find_key(_jwks, kid)
+        if key is None and now - _jwks_fetched_at > JWKS_MIN_REFETCH_SECONDS:
+            _jwks, _jwks_fetched_at = _fetch_jwks(), now
+            key = _find_key(_jwks, kid)
+    if key is None:
+        raise InvalidToken(f"unknown signing key {kid}")
+    return key
+
+
+def _find_key(jwks, kid):
+    for key in jwks.keys:
+        if key.key_id == kid:
+            return key
+    return None
+
+
+def _verify_jwks(token):
+    if pyjwt is None:
+        raise InvalidToken("PyJWT is required for JWKS verification")
+    try:
+        signing_key = _signing_key(pyjwt.get_unverified_header(token).get("kid"))
+        claims = pyjwt.decode(
+            token,
+            signing_key.key,
+            algorithms=["RS256", "ES256"],
+            options={"verify_aud": False, "verify_exp": False},
+        )
+    except pyjwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+    return _check_claims(claims)
+
+
+def _fetch_remote_user(token):
+    """
+    The old path: ask Supabase who this token belongs to. Returns None if
+    Supabase rejects the token (401/403); any other failure (timeout, 5xx
+    after retries) raises, since it says nothing about the token.
+    """
+    resp = http_clients.supabase.get(
+        f"{SUPABASE_URL}/auth/v1/user",
+        headers={
+            "apikey": SUPABASE_ANON_KEY,
+            "Authorization": f"Bearer {token}"
+        },
+    )
+    if resp.status_code in (401, 403):
+        return None
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _user_from_claims(claims):
+    # Same shape as the /auth/v1/user payload for the fields we use
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "role": claims.get("role"),
+        "aud": claims.get("aud"),
+        "app_metadata": claims.get("app_metadata", {}),
+        "user_metadata": claims.get("user_metadata", {}),
+    }
+
+
+# token -> (user, expires_at, verified_at)
+_cache = {}
+# token -> expires_at: remembered only until the token would have expired
+# anyway (or, for remote answers, been checked with Supabase again)
+_revoked = {}
+_rechecking = set()
+_lock = threading.Lock()
+
+
+def _recheck(token):
+    """Background revocation check against Supabase for a cached token."""
+    try:
+        user = _fetch_remote_user(token)
+        with _lock:
+            if user is None:
+                entry = _cache.pop(token, None)
+                if entry is not None:
+                    _revoked[token] = entry[1]
+            elif token in _cache:
+                cached_user, expires_at, _ = _cache[token]
+                _cache[token] = (cached_user, expires_at, time.time())
+    except Exception as e:
+        # Supabase unreachable or failing: not a revocation. The token stays
+        # valid and is checked again after another AUTH_RECHECK_SECONDS.
+        log.warning("token recheck failed", extra={"error": str(e)})
+        with _lock:
+            if token in _cache:
+                cached_user, expires_at, _ = _cache[token]
+                _cache[token] = (cached_user, expires_at, time.time())
+    finally:
+        with _lock:
+            _rechecking.discard(token)
+
+
+def _prune(now):
+    for token, (_, expires_at, _) in list(_cache.items()):
+        if expires_at < now:
+            del _cache[token]
+    for token, expires_at in list(_revoked.items()):
+        # _check_claims still accepts a token LEEWAY_SECONDS past its exp
+        if expires_at + LEEWAY_SECONDS < now:
+            del _revoked[token]
+
+
+def validate_supabase_token(token: str):
+    """
+    Returns the Supabase user for `token`, or None if it is missing/invalid.
+
+    Tokens are verified locally (HS256 secret or cached JWKS) and the result is
+    cached until the token expires. With AUTH_RECHECK_SECONDS set, cached tokens
+    are periodically re-confirmed with Supabase in the background so revoked
+    sessions stop working. Without any signing key configured we fall back to
+    asking Supabase directly (cached the same way).
+    """
+    if not token:
+        return None
+    now = time.time()
+    with _lock:
+        if token in _revoked:
+            return None
+        entry = _cache.get(token)
+        if entry is not None:
+            user, expires_at, verified_at = entry
+            if expires_at >= now:
+                if AUTH_RECHECK_SECONDS and now - verified_at > AUTH_RECHECK_SECONDS and token not in _rechecking:
+                    _rechecking.add(token)
+                    threading.Thread(target=_recheck, args=(token,), daemon=True).start()
+                return user
+            del _cache[token]
+
+    try:
+        if SUPABASE_JWT_SECRET:
+            claims = _verify_hs256(token, SUPABASE_JWT_SECRET)
+        elif SUPABASE_JWKS_URL:
+            claims = _verify_jwks(token)
+        else:
+            user = _fetch_remote_user(token)
+            if user is None:
+                return None
+            # No way to read exp without a key, so keep remote answers briefly
+            claims = {"exp": now + (AUTH_RECHECK_SECONDS or 60)}
+            with _lock:
+                _cache[token] = (user, claims["exp"], now)
+            return user
+    except InvalidToken as e:
+        log.info("invalid token", extra={"error": str(e)})
+        return None
+    except Exception as e:
+        log.warning("token validation failed", extra={"error": str(e)})
+        return None
+
+    user = _user_from_claims(claims)
+    with _lock:
+        if len(_cache) + len(_revoked) > 10000:
+            _prune(now)
+        _cache[token] = (user, claims["exp"], now)
+    return user
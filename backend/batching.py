@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and processes them together:
+    a batch is flushed once it holds `max_batch_size` items or the oldest
+    item has waited `max_wait` seconds. `process_batch(items)` must return
+    one result per item, in order.
+
+    stats() reports queue depth, a batch-size histogram and queue wait
+    times, to tune max_batch_size / max_wait against latency.
+    """
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait=0.01, name="batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batch_sizes = {}  # batch size -> number of batches
+        self.items = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def submit(self, item):
+        """Queue one item; returns a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def submit_many(self, items):
+        return [self.submit(item) for item in items]
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _record(self, batch):
+        now = time.monotonic()
+        waits = [now - submitted for _, _, submitted in batch]
+        with self._stats_lock:
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            self.items += len(batch)
+            self.total_wait += sum(waits)
+            self.max_wait_seen = max(self.max_wait_seen, max(waits))
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._record(batch)
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        with self._stats_lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "items": self.items,
+                "avg_batch_size": (self.items / batches) if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "avg_queue_wait_ms": (self.total_wait / self.items * 1000) if self.items else 0.0,
+                "max_queue_wait_ms": self.max_wait_seen * 1000,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
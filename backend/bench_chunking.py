@@ -0,0 +1,117 @@
+"""
+Compare the old duration-based character splitters with the shared
+token-budgeted chunker (chunking.py).
+
+    python bench_chunking.py [--captions]
+
+For synthetic transcripts from 10 minutes to 5 hours it reports, per
+consumer (summary, MCQ+flashcards, embeddings): LLM/embedding calls,
+transcript tokens sent, the largest chunk vs. the budget (anything over
+it gets truncated by the model) and how many chunk boundaries cut a word.
+`--captions` drops all punctuation, like YouTube auto-captions.
+"""
+import argparse
+import json
+import math
+
+from bench_data import synthetic_transcript
+from chunking import (
+    EMBEDDING_MAX_TOKENS,
+    LLM_CONTEXT_TOKENS,
+    chunk_text,
+    count_tokens,
+    token_budget,
+)
+
+LLM_MAX_NEW_TOKENS = 1024
+# Rough size of bullet_prompt / mcq_prompt_template without the transcript
+SUMMARY_PROMPT = "x" * 400
+MCQ_PROMPT = "x" * 1000
+
+
+# ---- the splitters this replaces ----
+
+def legacy_proportional(text, minutes):
+    # force_exact_chunks / chunk_transcript_for_mcq: 2 chunks per hour, by characters
+    num_chunks = max(1, math.ceil(2 * minutes / 60))
+    size = max(1, math.ceil(len(text) / num_chunks))
+    return [text[i * size:(i + 1) * size] for i in range(num_chunks) if text[i * size:(i + 1) * size]]
+
+
+def legacy_summary_calls(text, minutes):
+    # adaptive_summarize before: one stuffed prompt, or 2 map + 1 reduce for 30-60 min
+    if minutes <= 30 or minutes > 60:
+        return [text]
+    mid = len(text) // 2
+    return [text[:mid], text[mid:]]
+
+
+def mid_word_cuts(text, chunks):
+    cuts, pos = 0, 0
+    for chunk in chunks[:-1]:
+        pos = text.find(chunk, pos) + len(chunk)
+        if 0 < pos < len(text) and text[pos - 1].isalnum() and text[pos].isalnum():
+            cuts += 1
+    return cuts
+
+
+def report(text, chunks, budget, calls_per_chunk=1):
+    sizes = [count_tokens(c) for c in chunks]
+    return {
+        "calls": len(chunks) * calls_per_chunk,
+        "tokens_sent": sum(sizes) * calls_per_chunk,
+        "max_chunk_tokens": max(sizes) if sizes else 0,
+        "budget": budget,
+        "over_budget": sum(1 for s in sizes if s > budget),
+        "mid_word_cuts": mid_word_cuts(text, chunks),
+    }
+
+
+def run(minutes, captions):
+    text = synthetic_transcript(minutes, captions)
+    summary_budget = token_budget(SUMMARY_PROMPT, max_new_tokens=LLM_MAX_NEW_TOKENS)
+    mcq_budget = token_budget(MCQ_PROMPT, max_new_tokens=LLM_MAX_NEW_TOKENS)
+    embed_budget = token_budget(context_tokens=EMBEDDING_MAX_TOKENS)
+    return {
+        "minutes": minutes,
+        "transcript_tokens": count_tokens(text),
+        "summary": {
+            "legacy": report(text, legacy_summary_calls(text, minutes), summary_budget),
+            "chunked": report(text, chunk_text(text, summary_budget), summary_budget),
+        },
+        "mcq_flashcards": {
+            "legacy": report(text, legacy_proportional(text, minutes), mcq_budget, calls_per_chunk=2),
+            "chunked": report(text, chunk_text(text, mcq_budget), mcq_budget, calls_per_chunk=2),
+        },
+        "embeddings": {
+            "legacy": report(text, legacy_proportional(text, minutes), embed_budget),
+            "chunked": report(text, chunk_text(text, embed_budget), embed_budget),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--captions", action="store_true", help="no punctuation (auto-captions)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON only")
+    args = parser.parse_args()
+
+    results = [run(minutes, args.captions) for minutes in (10, 30, 45, 60, 90, 180, 300)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"context={LLM_CONTEXT_TOKENS} tokens, completion={LLM_MAX_NEW_TOKENS}")
+    print(f"{'min':>4} {'consumer':<15} {'calls old/new':>14} {'tokens old/new':>18} "
+          f"{'max chunk old/new (budget)':>30} {'over budget':>12} {'mid-word cuts':>14}")
+    for r in results:
+        for consumer in ("summary", "mcq_flashcards", "embeddings"):
+            old, new = r[consumer]["legacy"], r[consumer]["chunked"]
+            print(f"{r['minutes']:>4} {consumer:<15} {old['calls']:>6}/{new['calls']:<7} "
+                  f"{old['tokens_sent']:>8}/{new['tokens_sent']:<9} "
+                  f"{old['max_chunk_tokens']:>9}/{new['max_chunk_tokens']:<6} ({new['budget']:>5})     "
+                  f"{old['over_budget']:>4}/{new['over_budget']:<7} {old['mid_word_cuts']:>5}/{new['mid_word_cuts']:<5}")
+
+
+if __name__ == "__main__":
+    main()
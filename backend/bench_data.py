@@ -0,0 +1,25 @@
+"""Synthetic lecture transcripts shared by the offline benchmarks."""
+import random
+
+WORDS = (
+    "so today we are going to talk about gradient descent and how the learning rate "
+    "affects convergence of the loss function when training neural networks on large "
+    "datasets with stochastic mini batches and momentum based optimizers like adam"
+).split()
+
+
+def synthetic_transcript(minutes, captions=False, seed=0):
+    """
+    About `minutes` of speech (~150 words per minute) drawn from WORDS.
+    `captions` leaves out capitals and punctuation, like YouTube auto-captions.
+    """
+    rng = random.Random(seed)
+    words_total = int(minutes * 150)  # ~150 spoken words per minute
+    words = []
+    while len(words) < words_total:
+        sentence = [rng.choice(WORDS) for _ in range(rng.randint(6, 22))]
+        if not captions:
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += rng.choice([".", ".", ".", "?", "!"])
+        words.extend(sentence)
+    return " ".join(words[:words_total])
@@ -0,0 +1,101 @@
+"""
+Connection reuse of the pooled upstream clients against a local stub server.
+
+    python bench_http_pool.py [--requests 200] [--threads 8] [--json]
+
+The stub speaks HTTP/1.1 keep-alive and counts distinct TCP connections.
+The same calls are made three ways: bare requests.get/post (what app.py
+did before), a pooled http_clients.Upstream from one thread, and the same
+Upstream from --threads threads at once.
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_clients import Upstream
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = set()
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.connections.add(self.client_address)
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def _measure(label, call, count, threads):
+    _StubHandler.connections.clear()
+    started = time.perf_counter()
+    if threads == 1:
+        for _ in range(count):
+            call()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: call(), range(count)))
+    elapsed = time.perf_counter() - started
+    connections = len(_StubHandler.connections)
+    return {
+        "client": label,
+        "requests": count,
+        "threads": threads,
+        "tcp_connections": connections,
+        "requests_per_connection": count / connections if connections else 0.0,
+        "avg_ms": elapsed / count * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/auth/v1/user"
+    upstream = Upstream("stub", timeout=(2, 5), pool_maxsize=args.threads)
+
+    results = [
+        _measure("requests.get (no session)", lambda: requests.get(url, timeout=5), args.requests, 1),
+        _measure("pooled Upstream", lambda: upstream.get(url), args.requests, 1),
+        _measure("pooled Upstream", lambda: upstream.post(url, json={"prompt": "x"}), args.requests, args.threads),
+    ]
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'client':<28} {'threads':>7} {'requests':>9} {'tcp conns':>10} {'req/conn':>9} {'avg ms':>8}")
+    for r in results:
+        print(f"{r['client']:<28} {r['threads']:>7} {r['requests']:>9} {r['tcp_connections']:>10} "
+              f"{r['requests_per_connection']:>9.1f} {r['avg_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
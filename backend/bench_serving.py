@@ -0,0 +1,267 @@
+"""
+Load test: how many concurrent requests one server worker sustains, sync
+Flask (app.py) against the async serving mode (asgi.py).
+
+    python bench_serving.py [--servers flask asgi] [--threads 8] [--clients 64]
+                            [--requests 256] [--videos 16] [--minutes 10]
+                            [--latency-ms 200] [--stream 0.25] [--json]
+
+Each server runs in its own process and scratch directory, with Together
+replaced by fake_llm.FakeLLM (--latency-ms per call, a blocking wait like
+the real HTTP call), the embedding model by bench_stages.HashEmbeddings and
+YouTube by pre-seeded synthetic transcripts of --minutes each:
+
+  flask   app.app on a WSGI server with a fixed pool of --threads request
+          threads (what one gunicorn gthread worker does)
+  asgi    asgi.app under uvicorn with --threads pipeline executor threads
+
+--clients concurrent clients send --requests signed-in POST /transcript
+requests spread over --videos videos, so several clients ask for the same
+new video at once (a shared link); a --stream fraction of them use
+/transcript/stream instead. Reported per server: throughput, latency
+percentiles, the concurrency it sustained (sum of latencies / wall time)
+and the peak thread count of the server process. Exits non-zero if any
+request failed.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+JWT_SECRET = "bench-serving-secret"
+
+
+def _video_id(i):
+    return f"loadtest{i:03d}"
+
+
+def _segments(text, minutes, words_per_segment=20):
+    words = text.split()
+    count = max(1, len(words) // words_per_segment)
+    seconds = minutes * 60 / count
+    return [
+        {"text": " ".join(words[i * words_per_segment:(i + 1) * words_per_segment]),
+         "start": i * seconds, "duration": seconds}
+        for i in range(count)
+    ]
+
+
+def _pool_server(port, wsgi_app, threads):
+    from socketserver import ThreadingMixIn
+    from werkzeug.serving import BaseWSGIServer
+
+    class PoolWSGIServer(ThreadingMixIn, BaseWSGIServer):
+        # A fixed pool of request threads instead of one thread per connection
+        pool = ThreadPoolExecutor(threads, thread_name_prefix="wsgi-request")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+    return PoolWSGIServer("127.0.0.1", port, wsgi_app)
+
+
+def serve(args):
+    """Child process: one server with fake upstreams, until killed."""
+    os.environ.update({
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "ASGI_PIPELINE_WORKERS": str(args.threads),
+        "USAGE_MAX_LLM_TOKENS": "0",
+        "USAGE_MAX_LLM_REQUESTS": "0",
+        "USAGE_MAX_TRANSCRIPT_MINUTES": "0",
+        "USAGE_MAX_ACTIVE_RUNS": "0",
+        "WARMUP_ON_START": "false",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LANGSMITH_TRACING", "false")
+    os.environ.setdefault("LANGSMITH_API_KEY", "")
+    sys.path.insert(0, HERE)
+    os.chdir(tempfile.mkdtemp(prefix=f"bench_serving_{args.serve}_"))
+
+    import pipeline
+    import transcript_store
+    from bench_data import synthetic_transcript
+    from bench_stages import HashEmbeddings
+    from embeddings import get_embeddings
+    from fake_llm import FakeLLM
+
+    llm = FakeLLM(latency=args.latency_ms / 1000)
+    pipeline.get_llm = lambda: llm
+    get_embeddings()._model._factory = HashEmbeddings
+    for i in range(args.videos):
+        text = synthetic_transcript(args.minutes, seed=i)
+        transcript_store._store.set(_video_id(i), _segments(text, args.minutes))
+
+    if args.serve == "flask":
+        import app
+        _pool_server(args.port, app.app, args.threads).serve_forever()
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(f"{base}/ready", timeout=2).read()
+            return
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def _threads_of(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _request(base, token, video_id, stream):
+    """Seconds until the full answer arrived, and whether it succeeded."""
+    path = "/transcript/stream" if stream else "/transcript"
+    req = urllib.request.Request(
+        base + path,
+        data=json.dumps({"video_id": video_id}).encode(),
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+        method="POST",
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as response:
+            if stream:
+                ok = False
+                for line in response:
+                    if line.startswith(b"event: "):
+                        event = line[len(b"event: "):].strip()
+                        if event in (b"done", b"error"):
+                            ok = event == b"done"
+                            break
+            else:
+                ok = "summary" in json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError, socket.timeout, ValueError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run_load(server, args):
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    child = [sys.executable, os.path.abspath(__file__), "--serve", server, "--port", str(port),
+             "--threads", str(args.threads), "--videos", str(args.videos),
+             "--minutes", str(args.minutes), "--latency-ms", str(args.latency_ms)]
+    process = subprocess.Popen(child, cwd=HERE)
+    try:
+        _wait_ready(base, process)
+        sys.path.insert(0, HERE)
+        os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+        from auth import mint_token
+        from config import SUPABASE_JWT_AUDIENCE
+        token = mint_token(
+            {"sub": "load-test-user", "aud": SUPABASE_JWT_AUDIENCE, "exp": time.time() + 3600}, secret=JWT_SECRET)
+
+        peak_threads = [_threads_of(process.pid) or 0]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.05):
+                peak_threads[0] = max(peak_threads[0], _threads_of(process.pid) or 0)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        stream_every = round(1 / args.stream) if args.stream > 0 else 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as pool:
+            results = list(pool.map(
+                lambda i: _request(base, token, _video_id(i % args.videos), stream_every and i % stream_every == 0),
+                range(args.requests),
+            ))
+        wall = time.perf_counter() - started
+        done.set()
+        sampler.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies = sorted(seconds for seconds, _ in results)
+    return {
+        "server": server,
+        "requests": args.requests,
+        "errors": sum(1 for _, ok in results if not ok),
+        "wall_seconds": wall,
+        "requests_per_second": args.requests / wall,
+        "median_seconds": statistics.median(latencies),
+        "p95_seconds": latencies[int(0.95 * (len(latencies) - 1))],
+        "max_seconds": latencies[-1],
+        "sustained_concurrency": sum(latencies) / wall,
+        "peak_threads": peak_threads[0] or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=["flask", "asgi"], default=["flask", "asgi"])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--videos", type=int, default=16)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--stream", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true")
+    # Internal: run one server (started by the load test itself)
+    parser.add_argument("--serve", choices=["flask", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    runs = [run_load(server, args) for server in args.servers]
+    if args.json:
+        print(json.dumps({"settings": vars(args), "runs": runs}, indent=2))
+    else:
+        _print_table(runs, args)
+    # A failed request (non-2xx, or a stream ending in an error) makes the numbers meaningless
+    failed = [run["server"] for run in runs if run["errors"]]
+    if failed:
+        sys.exit(f"requests failed on: {', '.join(failed)}")
+
+
+def _print_table(runs, args):
+    print(f"{args.clients} clients, {args.requests} requests over {args.videos} videos, "
+          f"{args.threads} threads per worker, {args.latency_ms:g} ms per LLM call")
+    print(f"{'server':<7} {'req/s':>7} {'median':>8} {'p95':>8} {'max':>8} {'concurrency':>12} {'threads':>8} {'errors':>7}")
+    for run in runs:
+        print(f"{run['server']:<7} {run['requests_per_second']:>7.2f} {run['median_seconds']:>7.2f}s "
+              f"{run['p95_seconds']:>7.2f}s {run['max_seconds']:>7.2f}s {run['sustained_concurrency']:>12.1f} "
+              f"{run['peak_threads'] or '-':>8} {run['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
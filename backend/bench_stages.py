@@ -0,0 +1,202 @@
+"""
+Offline per-stage benchmark of the backend pipeline: no YouTube, no Together.
+
+    python bench_stages.py [--minutes 10 60 180 300] [--latency-ms 50] [--ms-per-token 0]
+                           [--queries 20] [--real-embeddings] [--output results.json]
+                           [--baseline previous.json --tolerance 0.25]
+
+For each synthetic transcript length it times, separately:
+  chunking    split_transcript_text_dynamic + chunk_transcript_for_mcq
+  ingest      embedding + store_chunks_in_chroma (VECTOR_STORE backend)
+  summary     adaptive_summarize
+  digests     build_digests (one structured digest per LLM chunk)
+  summary_digests  summarize_notes on those digests
+  mcqs        generate_mcqs (raw chunks; mcqs_digests: on the digests)
+  flashcards  generate_flashcards (raw chunks; flashcards_digests: on the digests)
+  normalize   normalize_mcqs + normalize_flashcards (/mcq-flashcards post-processing)
+  rag         answer_query against the video's index, --queries questions
+
+Together is replaced by fake_llm.FakeLLM (deterministic output, fixed
+latency per call plus an optional per-token cost), and unless
+--real-embeddings is given the embedding model by a hashing embedder, so
+numbers measure our own code and the number of model calls, not the
+network. Everything runs in a scratch directory, so caches start cold.
+
+--output writes the results as JSON; --baseline compares against an
+earlier --output file and exits non-zero if any stage got slower than
+--tolerance (fractional) or made more LLM calls.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_data import synthetic_transcript
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+QUESTIONS = [
+    "What does the learning rate affect?",
+    "How do mini batches change training?",
+    "Which optimizers use momentum?",
+    "What happens to the loss function during training?",
+]
+
+
+class HashEmbeddings:
+    """Deterministic unit vectors from the text hash; stands in for the HuggingFace model."""
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    @staticmethod
+    def _vector(text):
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIM)]
+        norm = sum(v * v for v in vector) ** 0.5
+        return [v / norm for v in vector]
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def bench_video(minutes, llm, queries):
+    from digests import build_digests, render_digest
+    from mcq_flashcard_generator import chunk_transcript_for_mcq, generate_flashcards, generate_mcqs
+    from mcq_validation import normalize_flashcards, normalize_mcqs
+    from rag import answer_query
+    from summarizer import adaptive_summarize, summarize_notes
+    from vector_utils import split_transcript_text_dynamic, store_chunks_in_chroma
+
+    text = synthetic_transcript(minutes)
+    video_id = f"bench{minutes:g}m"
+    stages = {}
+
+    def stage(name, fn, **extra):
+        llm.reset()
+        result, seconds = _timed(fn)
+        stages[name] = dict(seconds=seconds, **llm.usage(), **extra)
+        return result
+
+    def _chunk():
+        return split_transcript_text_dynamic(text, minutes), chunk_transcript_for_mcq(text, minutes)
+
+    documents, quiz_chunks = stage("chunking", _chunk)
+    stages["chunking"].update(embedding_chunks=len(documents), llm_chunks=len(quiz_chunks))
+
+    stage("ingest", lambda: store_chunks_in_chroma(documents, video_id=video_id), chunks=len(documents))
+    stage("summary", lambda: adaptive_summarize(llm, text, minutes))
+    mcqs_raw = stage("mcqs", lambda: generate_mcqs(llm, text, minutes))
+    flashcards_raw = stage("flashcards", lambda: generate_flashcards(llm, text, minutes))
+    notes = [render_digest(d) for d in stage("digests", lambda: build_digests(llm, text, minutes))]
+    stage("summary_digests", lambda: summarize_notes(llm, notes))
+    stage("mcqs_digests", lambda: generate_mcqs(llm, text, minutes, chunks=notes))
+    stage("flashcards_digests", lambda: generate_flashcards(llm, text, minutes, chunks=notes))
+    mcqs, flashcards = stage("normalize", lambda: (normalize_mcqs(mcqs_raw), normalize_flashcards(flashcards_raw)))
+    stages["normalize"].update(mcqs=len(mcqs), flashcards=len(flashcards))
+
+    latencies = []
+    llm.reset()
+    for i in range(queries):
+        _, seconds = _timed(lambda: answer_query(QUESTIONS[i % len(QUESTIONS)], video_id=video_id))
+        latencies.append(seconds)
+    latencies.sort()
+    stages["rag"] = dict(
+        seconds=sum(latencies),
+        queries=queries,
+        median_seconds=statistics.median(latencies) if latencies else 0.0,
+        p95_seconds=latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        **llm.usage(),
+    )
+    return {"minutes": minutes, "words": len(text.split()), "stages": stages}
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against an earlier run, as readable strings."""
+    previous = {run["minutes"]: run["stages"] for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        for name, stage in run["stages"].items():
+            before = previous.get(run["minutes"], {}).get(name)
+            if before is None:
+                continue
+            if stage["seconds"] > before["seconds"] * (1 + tolerance):
+                regressions.append(f"{run['minutes']:g} min {name}: {before['seconds']:.3f}s -> {stage['seconds']:.3f}s")
+            if stage["calls"] > before["calls"]:
+                regressions.append(f"{run['minutes']:g} min {name}: {before['calls']} -> {stage['calls']} LLM calls")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 180, 300])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--ms-per-token", type=float, default=0)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--real-embeddings", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # Cold caches and a throwaway chroma_db/vector_store: run in a scratch dir
+    os.environ.setdefault("LANGSMITH_TRACING", "false")
+    os.environ.setdefault("LANGSMITH_API_KEY", "")
+    sys.path.insert(0, HERE)
+    os.chdir(tempfile.mkdtemp(prefix="bench_stages_"))
+
+    import rag
+    from config import VECTOR_STORE
+    from embeddings import get_embeddings
+    from fake_llm import FakeLLM
+
+    llm = FakeLLM(latency=args.latency_ms / 1000, ms_per_token=args.ms_per_token)
+    rag.rag_llm._factory = lambda: llm
+    if not args.real_embeddings:
+        get_embeddings()._model._factory = HashEmbeddings
+
+    results = {
+        "settings": {
+            "latency_ms": args.latency_ms,
+            "ms_per_token": args.ms_per_token,
+            "queries": args.queries,
+            "embeddings": "real" if args.real_embeddings else "hash",
+            "vector_store": VECTOR_STORE,
+        },
+        "runs": [bench_video(minutes, llm, args.queries) for minutes in args.minutes],
+    }
+
+    print(f"{'video':>7} {'stage':<18} {'seconds':>9} {'llm calls':>10} {'prompt tok':>11}")
+    for run in results["runs"]:
+        for name, stage in run["stages"].items():
+            print(f"{run['minutes']:>5g}m {name:<18} {stage['seconds']:>9.3f} {stage['calls']:>10} {stage['prompt_tokens']:>11}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Backend cold-start benchmark: how long `import app` takes and how long
+the first requests take afterwards, each run in a fresh interpreter.
+
+    python bench_startup.py [--runs 5] [--rag] [--importtime] [--json]
+
+--rag          also time the first /rag request (pays for the lazy model loads)
+--importtime   list the slowest imports (python -X importtime)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.get('/ready')
+t2 = time.perf_counter()
+result = {"import_seconds": t1 - t0, "first_ready_seconds": t2 - t1}
+if "--rag" in sys.argv:
+    transcript = " ".join(["Gradient descent updates the weights against the gradient."] * 200)
+    client.post('/rag', json={"transcript": transcript, "query": "What does gradient descent do?"})
+    t3 = time.perf_counter()
+    result["first_rag_seconds"] = t3 - t2
+    client.post('/rag', json={"transcript": transcript, "query": "And the learning rate?"})
+    result["second_rag_seconds"] = time.perf_counter() - t3
+print("BENCH " + json.dumps(result))
+"""
+
+
+def run_once(rag):
+    args = [sys.executable, "-c", CHILD] + (["--rag"] if rag else [])
+    out = subprocess.run(args, cwd=HERE, capture_output=True, text=True, check=True).stdout
+    line = next(l for l in out.splitlines() if l.startswith("BENCH "))
+    return json.loads(line[len("BENCH "):])
+
+
+def slowest_imports(limit=15):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [p.strip() for p in line.split("|", 3)]
+        rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rag", action="store_true")
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    runs = [run_once(args.rag) for _ in range(args.runs)]
+    summary = {
+        key: {"median": statistics.median(r[key] for r in runs), "min": min(r[key] for r in runs)}
+        for key in runs[0]
+    }
+    if args.json:
+        print(json.dumps({"runs": runs, "summary": summary}, indent=2))
+    else:
+        for key, stats in summary.items():
+            print(f"{key:<22} median {stats['median']:.3f}s  min {stats['min']:.3f}s  ({args.runs} runs)")
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports():
+            print(f"  {cumulative_us / 1e6:8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
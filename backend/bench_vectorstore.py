@@ -0,0 +1,132 @@
+"""
+Recall and latency of the compact memory-mapped store (float16 / int8)
+against the current float32 paths, on synthetic embedding-like vectors.
+
+    python bench_vectorstore.py [--sizes 1000 20000 100000] [--queries 200] [--k 3] [--json]
+
+Ground truth is exact float32 cosine search (what FAISS IndexFlat does).
+FAISS and Chroma are timed too when they are installed.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from compact_store import CompactVectorStore, _normalize
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def synthetic_vectors(n, dim=DIM, clusters=64, seed=0):
+    # Topic clusters plus noise, closer to real transcript embeddings than pure noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return _normalize(centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32))
+
+
+def queries_for(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), size=count)
+    return _normalize(vectors[picks] + 0.3 * rng.normal(size=(count, vectors.shape[1])).astype(np.float32))
+
+
+def exact_topk(vectors, query, k):
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def timed(search, queries):
+    latencies, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append(search(q))
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies) * 1000
+    return results, {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+
+def recall(results, truth, k):
+    return float(np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)]))
+
+
+def bench_size(n, num_queries, k, workdir):
+    vectors = synthetic_vectors(n)
+    queries = queries_for(vectors, num_queries)
+    texts = [f"chunk {i}" for i in range(n)]
+    truth, truth_latency = timed(lambda q: exact_topk(vectors, q, k), queries)
+    rows = [dict(backend="float32 exact (numpy)", recall=1.0, heap_bytes=vectors.nbytes,
+                 disk_bytes=None, **truth_latency)]
+
+    for dtype in ("float16", "int8"):
+        path = f"{workdir}/{dtype}-{n}"
+        CompactVectorStore.build(path, texts, vectors, dtype=dtype)
+        store = CompactVectorStore(path)
+        results, latency = timed(lambda q: [row for _, row in store.search(q, k)], queries)
+        rows.append(dict(backend=f"compact {dtype} (mmap)", recall=recall(results, truth, k),
+                         heap_bytes=min(n, 4096) * DIM * 4, disk_bytes=store.disk_bytes(), **latency))
+
+    try:
+        import faiss
+        index = faiss.IndexFlatIP(DIM)
+        index.add(vectors)
+        results, latency = timed(lambda q: index.search(q[None, :], k)[1][0], queries)
+        rows.append(dict(backend="faiss IndexFlatIP float32", recall=recall(results, truth, k),
+                         heap_bytes=vectors.nbytes, disk_bytes=None, **latency))
+    except ImportError:
+        pass
+
+    try:
+        import chromadb
+        if n <= 50000:
+            client = chromadb.PersistentClient(path=f"{workdir}/chroma-{n}")
+            collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+            for start in range(0, n, 5000):
+                end = min(n, start + 5000)
+                collection.add(ids=[str(i) for i in range(start, end)],
+                               embeddings=vectors[start:end].tolist(), documents=texts[start:end])
+            results, latency = timed(
+                lambda q: [int(i) for i in collection.query(query_embeddings=[q.tolist()], n_results=k)["ids"][0]],
+                queries,
+            )
+            rows.append(dict(backend="chroma hnsw float32", recall=recall(results, truth, k),
+                             heap_bytes=None, disk_bytes=None, **latency))
+    except ImportError:
+        pass
+
+    return {"n": n, "dim": DIM, "k": k, "queries": num_queries, "results": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_vectorstore_")
+    try:
+        report = [bench_size(n, args.queries, args.k, workdir) for n in args.sizes]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for entry in report:
+        print(f"\nn={entry['n']} dim={entry['dim']} k={entry['k']}")
+        print(f"  {'backend':<28} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'heap MB':>9} {'disk MB':>9}")
+        for row in entry["results"]:
+            heap = f"{row['heap_bytes'] / 1e6:.1f}" if row["heap_bytes"] else "-"
+            disk = f"{row['disk_bytes'] / 1e6:.1f}" if row["disk_bytes"] else "-"
+            print(f"  {row['backend']:<28} {row['recall']:>7.3f} {row['p50_ms']:>8.3f} "
+                  f"{row['p95_ms']:>8.3f} {heap:>9} {disk:>9}")
+
+
+if __name__ == "__main__":
+    main()
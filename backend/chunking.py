@@ -0,0 +1,98 @@
+import math
+import re
+
+# Mistral-7B-Instruct-v0.1 context window (prompt + completion)
+LLM_CONTEXT_TOKENS = 8192
+# all-MiniLM-L6-v2 truncates its input after 256 word pieces
+EMBEDDING_MAX_TOKENS = 256
+# Headroom for the gap between our estimate and the real tokenizer
+SAFETY_MARGIN = 0.9
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+# Auto-generated captions have almost no punctuation; cap "sentences" at this many words
+MAX_UNIT_WORDS = 60
+
+
+def count_tokens(text):
+    """
+    Fast tokenizer-free estimate of BPE/SentencePiece tokens: every
+    punctuation mark is one token, words cost one token per ~4 characters.
+    """
+    return sum(max(1, math.ceil(len(p) / 4)) for p in _PIECE_RE.findall(text))
+
+
+def token_budget(prompt_template="", context_tokens=LLM_CONTEXT_TOKENS, max_new_tokens=0):
+    """How many transcript tokens fit in one call once the prompt and the completion are reserved."""
+    template = getattr(prompt_template, "template", prompt_template)
+    available = context_tokens - max_new_tokens - count_tokens(template)
+    return max(1, int(available * SAFETY_MARGIN))
+
+
+def split_units(text):
+    """
+    Split text into the smallest pieces we never cut through: sentences,
+    or runs of at most MAX_UNIT_WORDS words when there is no punctuation.
+    """
+    units = []
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        words = sentence.split()
+        for i in range(0, len(words), MAX_UNIT_WORDS):
+            units.append(" ".join(words[i:i + MAX_UNIT_WORDS]))
+    return [u for u in units if u]
+
+
+def _pack(units, sizes, limit):
+    chunks, current, current_size = [], [], 0
+    for unit, size in zip(units, sizes):
+        if current and current_size + size > limit:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append(unit)
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_oversized(unit, max_tokens):
+    # A single unit longer than the budget (very long word runs): fall back to word groups
+    pieces, current = [], []
+    for word in unit.split():
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_units(units, max_tokens, separator=" "):
+    """
+    Pack units (sentences, word runs, ...) into as few chunks as
+    possible with every chunk under `max_tokens`, then even the chunks out
+    so the last one isn't a tiny remainder (same number of calls, lower
+    worst-case latency when chunks are processed in parallel).
+    """
+    expanded = []
+    for unit in units:
+        if count_tokens(unit) > max_tokens:
+            expanded.extend(_split_oversized(unit, max_tokens))
+        else:
+            expanded.append(unit)
+    if not expanded:
+        return []
+
+    sizes = [count_tokens(u) + 1 for u in expanded]
+    greedy = _pack(expanded, sizes, max_tokens)
+    target = math.ceil(sum(sizes) / len(greedy))
+    balanced = _pack(expanded, sizes, max(target, max(sizes)))
+    chunks = balanced if len(balanced) == len(greedy) else greedy
+    return [separator.join(c) for c in chunks]
+
+
+def chunk_text(text, max_tokens):
+    """Sentence-aware chunking of a plain transcript string under a token budget."""
+    return chunk_units(split_units(text), max_tokens)
+
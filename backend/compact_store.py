@@ -0,0 +1,115 @@
+import json
+import os
+
+import numpy as np
+
+# Rows scored per step, so a search never materializes more than
+# BLOCK_ROWS x dim float32 values on the heap
+BLOCK_ROWS = 4096
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class CompactVectorStore:
+    """
+    Per-video vector index on disk, read through memory maps:
+
+        meta.json      dim, count, dtype
+        vectors.npy    unit-normalized embeddings as float16 or int8
+        scales.npy     per-row dequantization scale (int8 only)
+        chunks.txt     chunk texts, UTF-8, back to back
+        offsets.npy    int64 byte offsets into chunks.txt (count + 1)
+
+    Search is brute-force cosine similarity over the mapped array in
+    blocks: exact for float16 (up to rounding), near-exact for int8.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = None
+        if self.meta["dtype"] == "int8":
+            self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._chunks_path = os.path.join(path, "chunks.txt")
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    @classmethod
+    def build(cls, path, texts, vectors, dtype="float16"):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"unsupported dtype {dtype}")
+        unit = _normalize(vectors)
+        # Checked before anything is written: the dimension comes from the vectors
+        if len(texts) == 0 or unit.ndim != 2:
+            raise ValueError("cannot build an index without chunks: need one or more texts and vectors")
+        if unit.shape[0] != len(texts):
+            raise ValueError(f"got {len(texts)} texts but {unit.shape[0]} vectors")
+        os.makedirs(path, exist_ok=True)
+
+        if dtype == "int8":
+            # Symmetric per-row quantization: row ≈ q * scale
+            scales = np.maximum(np.abs(unit).max(axis=1), 1e-12) / 127.0
+            quantized = np.round(unit / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(path, "scales.npy"), scales.astype(np.float32))
+        else:
+            quantized = unit.astype(np.float16)
+        np.save(os.path.join(path, "vectors.npy"), quantized)
+
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        with open(os.path.join(path, "chunks.txt"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+
+        # meta.json last: its presence marks a complete index
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": int(unit.shape[1]), "count": len(encoded), "dtype": dtype}, f)
+        return cls(path)
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def search(self, query_vector, k=3):
+        """Top-k (score, row) pairs by cosine similarity, best first."""
+        count = len(self)
+        if count == 0:
+            return []
+        query = _normalize(query_vector).reshape(-1)
+        k = min(k, count)
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, count, BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            scores = block @ query
+            if self.scales is not None:
+                scores *= self.scales[start:start + BLOCK_ROWS]
+            scores = np.concatenate([best_scores, scores])
+            rows = np.concatenate([best_rows, np.arange(start, start + block.shape[0])])
+            if scores.shape[0] > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                scores, rows = scores[keep], rows[keep]
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores)
+        return [(float(best_scores[i]), int(best_rows[i])) for i in order]
+
+    def text(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        with open(self._chunks_path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8")
+
+    def disk_bytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.path, name))
+            for name in os.listdir(self.path)
+        )
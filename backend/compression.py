@@ -0,0 +1,60 @@
+import gzip
+
+from config import COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY
+
+try:
+    # Optional: brotli is ~15-20% smaller than gzip on JSON text
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/css", "application/javascript")
+
+
+def _accepts(accept_encoding, coding):
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _encode(body, accept_encoding):
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return "br", brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip", gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL)
+    return None, body
+
+
+def compress_response(response, accept_encoding):
+    """
+    Brotli/gzip-encode a buffered text/JSON response when the client accepts it.
+    Streams (SSE), small bodies and already-encoded responses are left alone.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    coding, encoded = encode_body(response.get_data(), accept_encoding)
+    if coding is None:
+        return response
+    response.set_data(encoded)
+    response.headers["Content-Encoding"] = coding
+    return response
+
+
+def encode_body(body, accept_encoding):
+    """
+    (content coding, encoded body) for a buffered text/JSON body, or
+    (None, body) when it is too small, not accepted or doesn't shrink.
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return None, body
+    coding, encoded = _encode(body, accept_encoding or "")
+    if coding is None or len(encoded) >= len(body):
+        return None, body
+    return coding, encoded
@@ -0,0 +1,85 @@
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+log = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):
+    """The caller gave up on the work (e.g. a cancelled job): stop at once, never retry."""
+
+
+def run_concurrently(fn, items, max_workers=4, timeout=None, retries=0, label="chunk", on_done=None):
+    """
+    Run `fn(item)` for every item on a bounded thread pool and return the
+    results in input order.
+
+    - `max_workers` caps how many calls are in flight at once.
+    - `timeout` is per item, counted from when that item starts running.
+      A timed-out call is abandoned (its thread finishes in the background)
+      and counted as failed.
+    - Only the failed items are retried, up to `retries` extra rounds.
+      If any item still fails, its original exception is raised.
+    - `on_done(index, result)` is called (in the caller's thread) as soon as
+      each item succeeds, e.g. to report progress. An exception from it
+      (such as Cancelled) stops the run: nothing further is started or
+      retried and it propagates as is. So does Cancelled raised by `fn`.
+    """
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+    errors = {}
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            log.info("retrying failed items", extra={"label": label, "count": len(pending), "attempt": attempt + 1})
+
+        started = {}
+
+        def _run(i):
+            started[i] = time.monotonic()
+            return fn(items[i])
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending))))
+        # copy_context() keeps contextvars (request-scoped state) visible in the workers
+        futures = {executor.submit(contextvars.copy_context().run, _run, i): i for i in pending}
+        failed = []
+        not_done = set(futures)
+        while not_done:
+            done, not_done = wait(not_done, timeout=0.5 if timeout else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Cancelled:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                except Exception as e:
+                    log.warning("item failed", extra={"label": label, "index": i, "error": str(e)})
+                    errors[i] = e
+                    failed.append(i)
+                    continue
+                errors.pop(i, None)
+                if on_done is not None:
+                    try:
+                        on_done(i, results[i])
+                    except BaseException:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise
+            if timeout:
+                now = time.monotonic()
+                for future in list(not_done):
+                    i = futures[future]
+                    if i in started and now - started[i] > timeout:
+                        log.warning("item timed out", extra={"label": label, "index": i, "timeout": timeout})
+                        errors[i] = TimeoutError(f"{label} {i} timed out after {timeout}s")
+                        failed.append(i)
+                        not_done.discard(future)
+        executor.shutdown(wait=False, cancel_futures=True)
+        pending = sorted(failed)
+
+    if pending:
+        raise errors[pending[0]]
+    return results
@@ -0,0 +1,115 @@
+import json
+import logging
+
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+
+import metrics
+from concurrency import Cancelled, run_concurrently
+from config import SUMMARY_MAX_WORKERS, SUMMARY_CHUNK_TIMEOUT, SUMMARY_CHUNK_RETRIES
+from mcq_flashcard_generator import chunk_transcript_for_mcq
+from result_cache import cached_result
+from singleflight import SingleFlight
+from summarizer import LLM_PARAMS
+
+log = logging.getLogger(__name__)
+
+# One compact, structured digest per transcript chunk, built once per video.
+# The summary reduce and the MCQ/flashcard prompts read these instead of the
+# raw transcript, so the full text goes through the LLM once, not three times.
+digest_prompt_template = """
+You MUST output ONLY valid JSON (no markdown, no code fences).
+
+Condense the transcript chunk below into study notes. Keep every fact, name,
+number and definition someone would need to summarize this part of the video
+or to write quiz questions about it; drop filler, repetition and small talk.
+
+Output schema (one object):
+{{
+  "key_facts": ["string", "..."],                            // self-contained facts, one sentence each
+  "terms": [{{"term": "string", "definition": "string"}}],   // concepts introduced or explained
+  "claims": ["string", "..."]                                // the speaker's opinions, arguments, conclusions
+}}
+
+Rules:
+1. Use only information from the chunk.
+2. Each entry must make sense without the transcript.
+3. Output ONLY the JSON object.
+
+Transcript chunk:
+{chunk}
+"""
+
+# Summary and quiz requests for a new video usually arrive together. A build
+# stopped because the job that led it was cancelled is redone by the others.
+_builds = SingleFlight("digest build", retry_on=(Cancelled,))
+
+
+def parse_digest(raw):
+    """The digest object in an LLM answer, with only well-formed entries kept."""
+    start, end = raw.find("{"), raw.rfind("}")
+    parsed = json.loads(raw[start:end + 1])
+    if not isinstance(parsed, dict):
+        raise ValueError("digest is not a JSON object")
+
+    def strings(key):
+        return [str(v).strip() for v in parsed.get(key) or [] if isinstance(v, (str, int, float)) and str(v).strip()]
+
+    terms = []
+    for item in parsed.get("terms") or []:
+        if isinstance(item, dict) and item.get("term") and item.get("definition"):
+            terms.append({"term": str(item["term"]).strip(), "definition": str(item["definition"]).strip()})
+    return {"key_facts": strings("key_facts"), "terms": terms, "claims": strings("claims")}
+
+
+def render_digest(digest):
+    """A digest as the plain-text notes that go into later prompts."""
+    lines = ["Key facts:"] + [f"- {fact}" for fact in digest["key_facts"]]
+    if digest["terms"]:
+        lines += ["Terms:"] + [f"- {t['term']}: {t['definition']}" for t in digest["terms"]]
+    if digest["claims"]:
+        lines += ["Claims:"] + [f"- {claim}" for claim in digest["claims"]]
+    return "\n".join(lines)
+
+
+@metrics.stage("digest")
+def build_digests(llm, transcript, video_duration_minutes, progress=None):
+    """Digest every LLM-sized chunk concurrently; a chunk whose JSON doesn't parse is retried on its own."""
+    chunks = chunk_transcript_for_mcq(transcript, video_duration_minutes)
+    prompt = PromptTemplate(template=digest_prompt_template, input_variables=["chunk"])
+    chain = LLMChain(llm=llm, prompt=prompt)
+
+    on_done = None
+    if progress is not None:
+        on_done = lambda i, _: progress("chunk_digested", index=i, total=len(chunks))
+    digests = run_concurrently(
+        lambda chunk: parse_digest(chain.run(chunk=chunk)),
+        chunks,
+        max_workers=SUMMARY_MAX_WORKERS,
+        timeout=SUMMARY_CHUNK_TIMEOUT,
+        retries=SUMMARY_CHUNK_RETRIES,
+        label="digest",
+        on_done=on_done,
+    )
+    log.info("digested transcript", extra={"chunks": len(chunks)})
+    return digests
+
+
+def video_digests(llm, video_id, transcript, video_duration_minutes, refresh=False, progress=None):
+    """
+    The video's chunk digests, rendered as notes: built on first use by
+    whichever endpoint gets there first, then read from the result cache.
+    A transcript with no text has no digests (and costs no LLM call).
+    """
+    if not transcript.strip():
+        return []
+
+    def _build():
+        return cached_result(
+            'digests', video_id,
+            lambda: build_digests(llm, transcript, video_duration_minutes, progress=progress),
+            templates=[digest_prompt_template], llm_params=LLM_PARAMS, refresh=refresh,
+        )
+
+    digests = _builds.do((video_id, refresh), _build)
+    return [render_digest(digest) for digest in digests]
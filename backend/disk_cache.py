@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete doesn't
+# fire the delete trigger that keeps `totals` right
+_UPSERT = (
+    "INSERT INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+    "created_at = excluded.created_at, accessed_at = excluded.accessed_at"
+)
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache backed by a single SQLite file.
+
+    - Values are serialized with `dumps`/`loads` (JSON by default).
+    - Entries older than `ttl` seconds are treated as missing.
+    - When the stored payload grows past `max_bytes`, the least recently
+      used entries are evicted first.
+    """
+
+    def __init__(self, path, max_bytes, ttl=None, dumps=None, loads=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._dumps = dumps or (lambda value: json.dumps(value).encode("utf-8"))
+        self._loads = loads or (lambda blob: json.loads(blob.decode("utf-8")))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        # Running total of `size`, kept by triggers in the same transaction as
+        # every write, so eviction needn't SUM the table (and processes sharing
+        # the file agree on it). Seeded from the entries of an older file.
+        self._conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO totals (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+                BEGIN UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+                BEGIN UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+                BEGIN UPDATE totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 0; END;
+            COMMIT;
+            """
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            blob, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return self._loads(blob)
+
+    def get_many(self, keys):
+        """Batch lookup: returns {key: value} for the keys that are present."""
+        now = time.time()
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value, created_at FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                hit_keys = []
+                for key, blob, created_at in rows:
+                    if self.ttl is None or now - created_at <= self.ttl:
+                        found[key] = blob
+                        hit_keys.append(key)
+                if hit_keys:
+                    self._conn.executemany(
+                        "UPDATE entries SET accessed_at = ? WHERE key = ?", [(now, k) for k in hit_keys]
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {key: self._loads(blob) for key, blob in found.items()}
+
+    def set_many(self, items):
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            blob = self._dumps(value)
+            rows.append((key, sqlite3.Binary(blob), len(blob), now, now))
+        with self._lock:
+            self._conn.executemany(
+                _UPSERT,
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def set(self, key, value):
+        blob = self._dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                _UPSERT,
+                (key, sqlite3.Binary(blob), len(blob), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def __contains__(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False
+        return self.ttl is None or time.time() - row[0] <= self.ttl
+
+    def _total_bytes(self):
+        return self._conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def _evict(self):
+        if self.ttl is not None:
+            cur = self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+            self.evictions += cur.rowcount
+        total = self._total_bytes()
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            self.evictions += 1
+            total -= row[1]
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_bytes()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
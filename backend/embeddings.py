@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from batching import MicroBatcher
+from config import (
+    CACHE_DIR,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_WAIT_MS,
+)
+from disk_cache import DiskCache
+from resources import lazy_resource
+
+
+class EmbeddingService(Embeddings):
+    """
+    The one embedding model for the whole process.
+
+    - The HuggingFace model is loaded on first use, not at import.
+    - Concurrent embed calls (ingest, /rag queries, ...) are merged into
+      larger forward passes by a MicroBatcher.
+    - Vectors are cached on disk keyed by model name + chunk text, so text
+      we've embedded before costs a SQLite lookup.
+    """
+
+    def __init__(self, model_name, cache, batch_size=64, batch_wait=0.01):
+        self.model_name = model_name
+        self._cache = cache
+        self._model = lazy_resource("embedding_model", self._load_model)
+        self._batcher = MicroBatcher(
+            self._embed_batch, max_batch_size=batch_size, max_wait=batch_wait, name="embedding-batcher"
+        )
+
+    @property
+    def loaded(self):
+        return self._model.loaded
+
+    def _load_model(self):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=self.model_name)
+
+    def model(self):
+        return self._model.get()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed_batch(self, texts):
+        with metrics.stage("embedding"):
+            return self.model().embed_documents(texts)
+
+    def embed_documents(self, texts):
+        keys = [self._key(t) for t in texts]
+        cached = self._cache.get_many(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            # Identical chunks within one call are embedded once
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], texts[i])
+            futures = dict(zip(unique, self._batcher.submit_many(list(unique.values()))))
+            fresh = {key: future.result() for key, future in futures.items()}
+            self._cache.set_many(fresh)
+            cached.update(fresh)
+
+        return [list(cached[key]) for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        return dict(self._cache.stats(), model=self.model_name, loaded=self.loaded)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embeddings():
+    """Process-wide EmbeddingService (created on first call; the model loads on first embed)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                cache = DiskCache(
+                    os.path.join(CACHE_DIR, "embeddings.sqlite3"),
+                    max_bytes=EMBEDDING_CACHE_MAX_BYTES,
+                    # float32 vectors as raw bytes, ~4x smaller than JSON
+                    dumps=lambda vector: array("f", vector).tobytes(),
+                    loads=lambda blob: array("f", blob).tolist(),
+                )
+                _service = EmbeddingService(
+                    EMBEDDING_MODEL_NAME,
+                    cache,
+                    batch_size=EMBEDDING_BATCH_SIZE,
+                    batch_wait=EMBEDDING_BATCH_WAIT_MS / 1000,
+                )
+    return _service
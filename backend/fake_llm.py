@@ -0,0 +1,100 @@
+"""
+Deterministic stand-in for the Together LLM, for offline benchmarks.
+
+It answers each of the app's prompts (summary, chunk digest, MCQ,
+flashcard, combined quiz, RAG) with well-formed output of the requested size, derived from the
+prompt text. It sleeps `latency + ms_per_token * completion tokens` to
+mimic a remote model and counts calls and tokens.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import List, Optional
+
+from langchain_core.language_models.llms import LLM
+
+from chunking import count_tokens
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z'-]{3,}")
+_usage_lock = threading.Lock()
+
+
+class FakeLLM(LLM):
+    latency: float = 0.05
+    ms_per_token: float = 0.0
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> str:
+        text = respond(prompt)
+        completion = count_tokens(text)
+        with _usage_lock:
+            self.calls += 1
+            self.prompt_tokens += count_tokens(prompt)
+            self.completion_tokens += completion
+        time.sleep(self.latency + self.ms_per_token * completion / 1000)
+        return text
+
+    def usage(self):
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    def reset(self):
+        with _usage_lock:
+            self.calls = self.prompt_tokens = self.completion_tokens = 0
+
+
+def _exactly(pattern, prompt, default):
+    m = re.search(pattern, prompt)
+    return int(m.group(1)) if m else default
+
+
+def respond(prompt):
+    """The fake model's answer to `prompt`: same prompt, same answer."""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    words = _WORD.findall(prompt.rsplit("Transcript", 1)[-1]) or ["topic"]
+
+    def phrase(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    def mcq():
+        options = [phrase(3) for _ in range(4)]
+        answer = rng.randrange(4)
+        return {
+            "question": f"What does the speaker say about {phrase(2)}?",
+            "options": options,
+            "answer_index": answer,
+            "explanation": f"The transcript states that {options[answer]}.",
+        }
+
+    def card():
+        return {"question": f"What is {phrase(2)}?", "answer": phrase(6)}
+
+    if '"key_facts"' in prompt:
+        return json.dumps({"key_facts": [phrase(12) + "." for _ in range(8)],
+                           "terms": [{"term": phrase(2), "definition": phrase(10)} for _ in range(4)],
+                           "claims": [phrase(12) + "." for _ in range(3)]})
+    if '"mcqs"' in prompt:
+        n_mcq = _exactly(r"exactly (\d+) multiple-choice", prompt, 4)
+        n_cards = _exactly(r"exactly (\d+) flashcards", prompt, 5)
+        return json.dumps({"mcqs": [mcq() for _ in range(n_mcq)],
+                           "flashcards": [card() for _ in range(n_cards)]})
+    if "multiple-choice" in prompt:
+        return json.dumps([mcq() for _ in range(_exactly(r"exactly (\d+) multiple-choice", prompt, 4))])
+    if "flashcards" in prompt:
+        cards = [card() for _ in range(_exactly(r"exactly (\d+) flashcards", prompt, 5))]
+        return "\n".join(f"Q: {c['question']}\nA: {c['answer']}" for c in cards)
+    if "Question:" in prompt:
+        return f"The transcript explains that {phrase(12)}."
+    return "\n".join([phrase(30) + "."] + [f"- {phrase(14)}" for _ in range(10)])
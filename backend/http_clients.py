@@ -0,0 +1,72 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import HTTP_POOL_MAXSIZE
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout, also for libraries that never pass one."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class Upstream:
+    """
+    A long-lived keep-alive session for one upstream service, with its own
+    connection pool size, default timeout and retry policy.
+    """
+
+    def __init__(self, name, timeout, pool_maxsize=HTTP_POOL_MAXSIZE, retries=None):
+        self.name = name
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = _TimeoutAdapter(
+            timeout,
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries or Retry(total=0, raise_on_status=False),
+            pool_block=False,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+def _retry(total, methods, retry_reads=True, statuses=(502, 503, 504), backoff=0.3):
+    return Retry(
+        total=total,
+        connect=total,
+        read=total if retry_reads else 0,
+        status=total,
+        backoff_factor=backoff,
+        status_forcelist=statuses,
+        allowed_methods=frozenset(methods),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+
+
+# (connect, read) timeouts per upstream
+supabase = Upstream("supabase", timeout=(3, 5), retries=_retry(2, ["GET"]))
+# Completions can take a while; a read timeout may already have spent tokens,
+# so retries only cover connection errors and 502-504
+together = Upstream("together", timeout=(5, 120), retries=_retry(2, ["POST"], retry_reads=False))
+# Checkout creation is not idempotent: never retried automatically
+lemonsqueezy = Upstream("lemonsqueezy", timeout=(5, 20), retries=Retry(total=0, raise_on_status=False))
+youtube = Upstream("youtube", timeout=(5, 30), retries=_retry(3, ["GET", "POST"]))
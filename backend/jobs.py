@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from concurrency import Cancelled
+from config import JOB_HEARTBEAT_SECONDS, JOB_STALE_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+class JobCancelled(Cancelled):
+    pass
+
+
+class JobQueue:
+    """
+    Persistent, prioritized background job queue backed by SQLite.
+
+    - `submit()` stores the job and returns its id right away.
+    - A fixed pool of worker threads runs queued jobs, highest `priority`
+      first, then oldest first.
+    - Jobs survive restarts: anything still queued (or interrupted while
+      running) is picked up again when the queue starts.
+    - Several processes may share the file. A job is claimed by exactly one
+      of them (a conditional UPDATE), which keeps its `worker` id and
+      `heartbeat` on the row; only running jobs whose heartbeat went stale
+      (their process died) are put back in the queue.
+    - `cancel()` drops a queued job immediately; a running job stops at
+      its next progress report, in whichever process runs it.
+    """
+
+    def __init__(self, path, handlers, workers=2, describe_error=None,
+                 heartbeat=JOB_HEARTBEAT_SECONDS, stale_after=JOB_STALE_SECONDS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.handlers = handlers
+        self.workers = workers
+        # Turns a handler exception into the JSON stored as the job's error
+        self.describe_error = describe_error or (lambda e: {"error": str(e)})
+        self.heartbeat = heartbeat
+        self.stale_after = stale_after
+        # Identifies this process's pool on the rows it claims
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                user_id TEXT,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                worker TEXT,
+                heartbeat REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Files created before jobs had owners
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("worker", "TEXT"), ("heartbeat", "REAL"),
+                             ("cancel_requested", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created_at)")
+        self._conn.commit()
+
+    def start(self):
+        """Start this process's workers; call from the serving entry point, not at import."""
+        with self._lock:
+            if self._threads:
+                return
+            self._requeue_stale()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, params, priority=0, user_id=None):
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, params, priority, status, user_id, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), int(priority), user_id, time.time()),
+            )
+            self._conn.commit()
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id, include_result=False):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, params, priority, status, user_id, progress, result, error, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "id": row[0],
+            "kind": row[1],
+            "params": json.loads(row[2]),
+            "priority": row[3],
+            "status": row[4],
+            "user_id": row[5],
+            "progress": json.loads(row[6]) if row[6] else None,
+            "error": json.loads(row[8]) if row[8] else None,
+            "created_at": row[9],
+            "started_at": row[10],
+            "finished_at": row[11],
+        }
+        if include_result:
+            job["result"] = json.loads(row[7]) if row[7] else None
+        return job
+
+    def cancel(self, job_id):
+        """Returns the job's status after the request, or None if it doesn't exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = row[0]
+            if status == "queued":
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?",
+                    (time.time(), job_id),
+                )
+                self._conn.commit()
+                return "cancelled"
+            if status == "running":
+                # Seen by the progress callback of whichever process runs it
+                self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+                self._conn.commit()
+                return "cancelling"
+            return status
+
+    def pending(self, user_id):
+        """How many of the user's jobs are queued or running."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN ('queued', 'running')",
+                (user_id,),
+            ).fetchone()
+        return row[0]
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _requeue_stale(self):
+        # Called with the lock held. Jobs whose process stopped beating (or
+        # that predate heartbeats) start over; live processes' jobs are left alone.
+        requeued = self._conn.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, worker = NULL, heartbeat = NULL "
+            "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+            (time.time() - self.stale_after,),
+        ).rowcount
+        self._conn.commit()
+        if requeued:
+            log.info("requeued jobs of a dead worker", extra={"count": requeued})
+
+    def _claim(self):
+        # Called with the lock held. Another process may claim the same row
+        # between the SELECT and the UPDATE: the status guard lets only one win.
+        while True:
+            row = self._conn.execute(
+                "SELECT id, kind, params FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, created_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker = ?, heartbeat = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, self.worker_id, now, row[0]),
+            ).rowcount
+            self._conn.commit()
+            if claimed:
+                return row[0], row[1], json.loads(row[2])
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat)
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = 'running'",
+                    (time.time(), self.worker_id),
+                )
+                self._conn.commit()
+                self._requeue_stale()
+                self._wakeup.notify_all()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            # Only while still ours: a job requeued from under us belongs to its new worker
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    json.dumps(error) if error is not None else None,
+                    time.time(),
+                    job_id,
+                    self.worker_id,
+                ),
+            )
+            self._conn.commit()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                claimed = self._claim()
+                while claimed is None:
+                    self._wakeup.wait(timeout=5)
+                    claimed = self._claim()
+            job_id, kind, params = claimed
+
+            def progress(event, **data):
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                    if row is None or row[0]:
+                        raise JobCancelled(job_id)
+                    if event == "token":
+                        # Too chatty to persist; the stream endpoints relay these
+                        return
+                    self._conn.execute(
+                        "UPDATE jobs SET progress = ? WHERE id = ?",
+                        (json.dumps(dict(data, event=event)), job_id),
+                    )
+                    self._conn.commit()
+
+            log.info("job started", extra={"job_id": job_id, "kind": kind})
+            try:
+                result = self.handlers[kind](params, progress)
+            except JobCancelled:
+                log.info("job cancelled", extra={"job_id": job_id})
+                self._finish(job_id, "cancelled")
+            except Exception as e:
+                log.error("job failed", extra={"job_id": job_id, "kind": kind, "error": str(e)})
+                self._finish(job_id, "failed", error=self.describe_error(e))
+            else:
+                log.info("job done", extra={"job_id": job_id, "kind": kind})
+                self._finish(job_id, "done", result=result)
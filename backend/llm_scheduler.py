@@ -0,0 +1,259 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from config import (
+    TOGETHER_REQUESTS_PER_MINUTE,
+    TOGETHER_TOKENS_PER_MINUTE,
+    TOGETHER_MAX_CONCURRENCY,
+    TOGETHER_MAX_RETRIES,
+    TOGETHER_BACKOFF_BASE_SECONDS,
+    TOGETHER_BACKOFF_MAX_SECONDS,
+)
+
+log = logging.getLogger(__name__)
+
+# Lower runs first
+INTERACTIVE = 0  # a user is waiting on the answer (/transcript, /rag)
+NORMAL = 5
+BULK = 10        # quiz generation, background jobs
+
+_priority = contextvars.ContextVar("llm_priority", default=NORMAL)
+
+
+@contextlib.contextmanager
+def llm_priority(priority):
+    """LLM calls made in this block (and in run_concurrently workers it starts) queue at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimited(Exception):
+    """The provider answered 429; `retry_after` is its Retry-After in seconds, if it sent one."""
+
+    def __init__(self, message="rate limited", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(RateLimited):
+    """Still rate limited after every retry; surfaced to the client as 429."""
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, up to one minute's worth banked."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # a huge request mustn't wait forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMScheduler:
+    """
+    One admission queue for every call to a rate-limited LLM provider.
+
+    - Token buckets on requests/minute and tokens/minute: a call starts only
+      when both have room for it (tokens are reserved up front as prompt +
+      max completion, unused ones given back afterwards).
+    - Adaptive concurrency (AIMD): the in-flight limit halves on a 429 and
+      grows by one after a limit's worth of successes, up to max_concurrency.
+    - A 429 pauses all admissions for the backoff delay (Retry-After, or
+      exponential with full jitter) and the call is retried, up to
+      `max_retries` times, before RateLimitExceeded reaches the user.
+    - Waiting calls are admitted by priority (INTERACTIVE before BULK),
+      first come first served within a priority.
+    """
+
+    def __init__(self, name, requests_per_minute, tokens_per_minute, max_concurrency,
+                 max_retries=5, backoff_base=1.0, backoff_max=60.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._limit = max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.calls = 0
+        self.rate_limited = 0
+        self.exhausted = 0
+        self.queue_wait_seconds = 0.0
+
+    def call(self, fn, tokens=0, priority=None):
+        """Run `fn()` once admitted; retry it with backoff while it raises RateLimited."""
+        priority = _priority.get() if priority is None else priority
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens, priority)
+            try:
+                result = fn()
+            except RateLimited as e:
+                self._rate_limited(attempt, e, tokens)
+                continue
+            except BaseException:
+                self._release(success=None)
+                raise
+            self._release(success=True)
+            return result
+
+    def stream(self, open_stream, tokens=0, priority=None):
+        """
+        call() for a streamed answer: `open_stream()` sends the request and
+        returns an iterator over the answer, whose items are yielded as they
+        arrive. The call keeps its slot until the iterator is exhausted (or
+        abandoned). Only opening it is retried on RateLimited: chunks already
+        handed out can't be taken back.
+        """
+        priority = _priority.get() if priority is None else priority
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens, priority)
+            try:
+                chunks = open_stream()
+            except RateLimited as e:
+                self._rate_limited(attempt, e, tokens)
+                continue
+            except BaseException:
+                self._release(success=None)
+                raise
+            try:
+                yield from chunks
+            except BaseException:
+                self._release(success=None)
+                raise
+            self._release(success=True)
+            return
+
+    def _rate_limited(self, attempt, e, tokens):
+        """After a 429 on `attempt`: back off, or give up with RateLimitExceeded after the last retry."""
+        self._release(success=False)
+        # The provider refused the call, so its reservation wasn't spent
+        self.refund(tokens)
+        last = attempt == self.max_retries
+        # Nobody retries after the last attempt: don't hold everyone else back for it
+        delay = self._backoff(attempt, e.retry_after, pause=not last)
+        if last:
+            with self._cond:
+                self.exhausted += 1
+            raise RateLimitExceeded(str(e), retry_after=delay) from e
+        log.warning("rate limited, backing off", extra={
+            "scheduler": self.name, "attempt": attempt + 1, "delay": round(delay, 2),
+            "concurrency_limit": self._limit})
+
+    def refund(self, tokens):
+        """Give back reserved tokens a call didn't use."""
+        if tokens > 0:
+            with self._cond:
+                self._tokens.give_back(tokens)
+                self._cond.notify_all()
+
+    def _acquire(self, tokens, priority):
+        enqueued = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        if now < self._paused_until:
+                            timeout = self._paused_until - now
+                        elif self._in_flight < self._limit:
+                            timeout = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+                            if timeout <= 0:
+                                break
+                    self._cond.wait(timeout)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self._in_flight += 1
+            self.calls += 1
+            self.queue_wait_seconds += time.monotonic() - enqueued
+            self._cond.notify_all()
+
+    def _release(self, success):
+        with self._cond:
+            self._in_flight -= 1
+            if success:
+                self._successes += 1
+                if self._successes >= self._limit and self._limit < self.max_concurrency:
+                    self._limit += 1
+                    self._successes = 0
+            elif success is False:
+                self.rate_limited += 1
+                self._successes = 0
+                self._limit = max(1, self._limit // 2)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt, retry_after, pause=True):
+        # Full jitter, but never sooner than the provider asked
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, retry_after)
+        if not pause:
+            return delay
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        return delay
+
+    def stats(self):
+        with self._cond:
+            return {
+                "calls": self.calls,
+                "in_flight": self._in_flight,
+                "concurrency_limit": self._limit,
+                "queued": len(self._waiting),
+                "rate_limited": self.rate_limited,
+                "exhausted": self.exhausted,
+                "avg_queue_wait_seconds": self.queue_wait_seconds / self.calls if self.calls else 0.0,
+                "paused_for_seconds": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+# Shared by every client get_llm() hands out
+together = LLMScheduler(
+    "together",
+    requests_per_minute=TOGETHER_REQUESTS_PER_MINUTE,
+    tokens_per_minute=TOGETHER_TOKENS_PER_MINUTE,
+    max_concurrency=TOGETHER_MAX_CONCURRENCY,
+    max_retries=TOGETHER_MAX_RETRIES,
+    backoff_base=TOGETHER_BACKOFF_BASE_SECONDS,
+    backoff_max=TOGETHER_BACKOFF_MAX_SECONDS,
+)
@@ -0,0 +1,56 @@
+"""
+Leveled, structured logging for the backend.
+
+Modules log through `logging.getLogger(__name__)` and pass fields with
+`extra={...}`. configure_logging() prints one JSON object per line
+(LOG_FORMAT=json), or `message key=value ...` for LOG_FORMAT=text, at
+LOG_LEVEL.
+"""
+import json
+import logging
+import sys
+
+from config import LOG_FORMAT, LOG_LEVEL
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = " ".join(f"{k}={v}" for k, v in _fields(record).items())
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line += " " + fields
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    # LangChain / HTTP client chatter only at WARNING and above
+    for noisy in ("httpx", "urllib3", "langchain", "chromadb"):
+        logging.getLogger(noisy).setLevel(max(logging.WARNING, root.level))
@@ -1,23 +1,18 @@
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
-import json
-import re
-import math
+import logging
 
-def chunk_transcript_for_mcq(transcript: str, video_duration_minutes: float):
-    """Chunks transcript into proportional pieces: 2 chunks per hour."""
-    num_chunks = max(1, int(math.ceil(2 * (video_duration_minutes / 60))))
-    chunk_size = max(1, len(transcript) // num_chunks)
-    return [
-        transcript[i * chunk_size: (i + 1) * chunk_size]
-        for i in range(num_chunks)
-    ]
-
-def generate_mcqs(llm, transcript: str, video_duration_minutes: float, num_questions_per_chunk: int = 4) -> list:
-    chunks = chunk_transcript_for_mcq(transcript, video_duration_minutes)
-
-    # Escape JSON braces by doubling them so PromptTemplate doesn't treat them as placeholders.
-    prompt_template = """
+import metrics
+from chunking import chunk_text, token_budget
+from concurrency import run_concurrently
+from config import QUIZ_MAX_WORKERS, QUIZ_CHUNK_TIMEOUT, QUIZ_CHUNK_RETRIES, MCQ_TOPUP_RETRIES
+from mcq_validation import extract_quiz_items, question_key, validate_flashcards, validate_mcqs
+from summarizer import LLM_PARAMS
+
+log = logging.getLogger(__name__)
+
+# Escape JSON braces by doubling them so PromptTemplate doesn't treat them as placeholders.
+mcq_prompt_template = """
 You MUST output ONLY valid JSON (no markdown, no code fences).
 
 Given the transcript chunk below, generate exactly {num_questions} multiple-choice questions.
@@ -43,56 +38,39 @@ Transcript chunk:
 {chunk}
 """
 
-    # Make input_variables explicit to avoid surprises
-    prompt = PromptTemplate(template=prompt_template, input_variables=["chunk", "num_questions"])
-    chain = LLMChain(llm=llm, prompt=prompt)
-
-    all_mcqs = []
-    for chunk in chunks:
-        # run with matching kwarg name
-        raw = chain.run(chunk=chunk, num_questions=num_questions_per_chunk)
-
-        # Try to extract the first JSON array from the model output (robust fallback)
-        m = re.search(r'(\[\s*\{.*?\}\s*\])', raw, re.S)
-        json_text = m.group(1) if m else raw
-
-        try:
-            parsed = json.loads(json_text)
-        except Exception as e:
-            # Debug output to help you see what the model returned
-            print("Failed to parse MCQ JSON from LLM. Raw output below:")
-            print(raw)
-            raise
-
-        # Validate and normalize to your frontend shape
-        validated = []
-        for i, item in enumerate(parsed):
-            if (not isinstance(item, dict) or
-                not isinstance(item.get("question"), str) or
-                not isinstance(item.get("options"), list) or
-                len(item["options"]) != 4 or
-                not isinstance(item.get("answer_index"), int) or
-                not 0 <= item["answer_index"] < 4):
-                print(f"Skipping invalid MCQ at index {i}: {item}")
-                continue
-            validated.append({
-                "question": item["question"].strip(),
-                "options": [o.strip() for o in item["options"]],
-                "correct": int(item["answer_index"]),
-                "explanation": (item.get("explanation") or "").strip()
-            })
-
-        # append the validated MCQs for this chunk
-        all_mcqs.append(validated)
+quiz_prompt_template = """
+You MUST output ONLY valid JSON (no markdown, no code fences).
 
-    # Return list-of-lists (one list per chunk) to match how you already handle outputs
-    return all_mcqs
+Given the transcript chunk below, generate exactly {num_questions} multiple-choice questions
+and exactly {num_flashcards} flashcards.
+
+Output schema (one object):
+{{
+  "mcqs": [
+    {{
+      "question": "string (one or two sentences)",
+      "options": ["string","string","string","string"],   // exactly 4 options
+      "answer_index": 0,                                 // integer 0-3
+      "explanation": "string (1-2 sentences)"
+    }}
+  ],
+  "flashcards": [
+    {{"question": "string", "answer": "string"}}
+  ]
+}}
 
+Rules:
+1. Exactly {num_questions} objects in "mcqs" and {num_flashcards} in "flashcards".
+2. Exactly 4 distinct options per question. Do NOT prefix options with letters (A/B/C/D).
+3. answer_index must be the zero-based index of the correct option.
+4. Keep everything concise, factual, and directly tied to the chunk.
+5. Output ONLY the JSON object.
 
-def generate_flashcards(llm, transcript: str, video_duration_minutes: float, num_flashcards_per_chunk: int = 5) -> list:
-    chunks = chunk_transcript_for_mcq(transcript, video_duration_minutes)
+Transcript chunk:
+{chunk}
+"""
 
-    prompt_template = """
+flashcard_prompt_template = """
 Based on the transcript chunk below, generate exactly {num_flashcards} flashcards.
 Format each as:
 Q: <question>
@@ -107,7 +85,86 @@ Transcript chunk:
 {chunk}
 """
 
-    prompt = PromptTemplate(template=prompt_template, input_variables=["chunk", "num_flashcards"])
+
+@metrics.stage("chunking")
+def chunk_transcript_for_mcq(transcript: str, video_duration_minutes: float):
+    """Sentence-aware chunks sized to what fits in one MCQ/flashcard prompt."""
+    budget = token_budget(
+        max(mcq_prompt_template, flashcard_prompt_template, quiz_prompt_template, key=len),
+        max_new_tokens=LLM_PARAMS["max_tokens"],
+    )
+    return chunk_text(transcript, budget)
+
+def collect_quiz_items(ask, num_questions, num_flashcards=0, retries=None):
+    """
+    Keep every valid MCQ (and flashcard) from each model answer, even when
+    the JSON around them is broken, and re-ask only for the number still
+    missing, at most `retries` (MCQ_TOPUP_RETRIES) more times.
+    `ask(missing_questions, missing_flashcards)` returns the raw model output,
+    the whole completion: items are parsed once the call has finished, not
+    while it streams, so a top-up costs another full (but smaller) call.
+    Returns (mcqs, flashcards) in the validated frontend shape.
+    """
+    retries = MCQ_TOPUP_RETRIES if retries is None else retries
+    mcqs, flashcards, seen = [], [], set()
+    for attempt in range(retries + 1):
+        missing_questions = max(0, num_questions - len(mcqs))
+        missing_flashcards = max(0, num_flashcards - len(flashcards))
+        if not (missing_questions or missing_flashcards):
+            break
+        if attempt:
+            log.info("re-requesting missing quiz items", extra={
+                "attempt": attempt, "mcqs": missing_questions, "flashcards": missing_flashcards})
+        raw = ask(missing_questions, missing_flashcards)
+        raw_mcqs, raw_flashcards = extract_quiz_items(raw)
+        if not (raw_mcqs or raw_flashcards):
+            log.warning("no quiz items in LLM output", extra={"raw": raw[:500]})
+        for item in validate_mcqs(raw_mcqs):
+            key = question_key(item)
+            if key not in seen:
+                seen.add(key)
+                mcqs.append(item)
+        flashcards.extend(validate_flashcards(raw_flashcards))
+
+    if len(mcqs) < num_questions or len(flashcards) < num_flashcards:
+        log.warning("chunk quiz incomplete after retries", extra={
+            "mcqs": len(mcqs), "wanted_mcqs": num_questions,
+            "flashcards": len(flashcards), "wanted_flashcards": num_flashcards})
+    return mcqs[:num_questions], flashcards[:num_flashcards]
+
+
+@metrics.stage("mcqs")
+def generate_mcqs(llm, transcript: str, video_duration_minutes: float, num_questions_per_chunk: int = 4,
+                  chunks: list = None) -> list:
+    # `chunks`: prompt inputs to use instead of the raw transcript chunks (e.g. chunk digests)
+    if chunks is None:
+        chunks = chunk_transcript_for_mcq(transcript, video_duration_minutes)
+
+    # Make input_variables explicit to avoid surprises
+    prompt = PromptTemplate(template=mcq_prompt_template, input_variables=["chunk", "num_questions"])
+    chain = LLMChain(llm=llm, prompt=prompt)
+
+    all_mcqs = []
+    for chunk in chunks:
+        # A malformed answer costs a re-ask for the missing questions of this
+        # chunk only, not the whole request
+        mcqs, _ = collect_quiz_items(
+            lambda missing, _: chain.run(chunk=chunk, num_questions=missing),
+            num_questions_per_chunk,
+        )
+        all_mcqs.append(mcqs)
+
+    # Return list-of-lists (one list per chunk) to match how you already handle outputs
+    return all_mcqs
+
+
+@metrics.stage("flashcards")
+def generate_flashcards(llm, transcript: str, video_duration_minutes: float, num_flashcards_per_chunk: int = 5,
+                        chunks: list = None) -> list:
+    if chunks is None:
+        chunks = chunk_transcript_for_mcq(transcript, video_duration_minutes)
+
+    prompt = PromptTemplate(template=flashcard_prompt_template, input_variables=["chunk", "num_flashcards"])
     chain = LLMChain(llm=llm, prompt=prompt)
 
     all_flashcards = []
@@ -116,3 +173,43 @@ Transcript chunk:
         all_flashcards.append(raw.strip())
 
     return all_flashcards
+
+
+@metrics.stage("quiz")
+def generate_quiz(llm, transcript: str, video_duration_minutes: float,
+                  num_questions_per_chunk: int = 4, num_flashcards_per_chunk: int = 5,
+                  max_workers: int = None, on_chunk=None, chunks: list = None):
+    """
+    MCQs and flashcards from ONE structured prompt per chunk, with chunks
+    running concurrently (at most `max_workers` at a time). Valid items are
+    kept even from broken JSON and only the missing ones are re-requested
+    (collect_quiz_items); a chunk whose LLM call fails is retried on its own.
+    Returns (mcqs, flashcards), each a list-of-lists with one list per chunk.
+    `on_chunk(index, total, mcqs, flashcards)` is called as each chunk finishes.
+    `chunks` replaces the raw transcript chunks as prompt inputs (e.g. chunk digests).
+    """
+    if chunks is None:
+        chunks = chunk_transcript_for_mcq(transcript, video_duration_minutes)
+
+    prompt = PromptTemplate(template=quiz_prompt_template,
+                            input_variables=["chunk", "num_questions", "num_flashcards"])
+    chain = LLMChain(llm=llm, prompt=prompt)
+
+    def _quiz_for_chunk(chunk):
+        return collect_quiz_items(
+            lambda missing_questions, missing_flashcards: chain.run(
+                chunk=chunk, num_questions=missing_questions, num_flashcards=missing_flashcards),
+            num_questions_per_chunk,
+            num_flashcards_per_chunk,
+        )
+
+    results = run_concurrently(
+        _quiz_for_chunk,
+        chunks,
+        max_workers=max_workers or QUIZ_MAX_WORKERS,
+        timeout=QUIZ_CHUNK_TIMEOUT,
+        retries=QUIZ_CHUNK_RETRIES,
+        on_done=(lambda i, r: on_chunk(i, len(chunks), *r)) if on_chunk else None,
+    )
+    log.info("generated quiz", extra={"chunks": len(chunks)})
+    return [mcqs for mcqs, _ in results], [cards for _, cards in results]
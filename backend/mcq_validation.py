@@ -0,0 +1,276 @@
+import json
+import logging
+import re
+from functools import lru_cache
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Validation stage for LLM quiz output, shared by the generators (per chunk,
+# as answers arrive) and the /mcq-flashcards post-processing. Patterns are
+# compiled once at import and the text normalization is memoized, since the
+# same options/explanations are compared many times per question.
+_FLASHCARD = re.compile(r'Q:\s*(.*?)\s*A:\s*(.*?)(?=\nQ:|\Z)', re.DOTALL)
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_decoder = json.JSONDecoder()
+
+
+def iter_json_objects(raw):
+    """
+    Every complete JSON object in `raw`, left to right, skipping whatever
+    doesn't parse: code fences, chatter, or an answer cut off mid-object.
+    An object that parses as a whole is yielded once (not its children).
+    "Incremental" means object by object within one finished completion:
+    the LLM call is not streamed, so parsing starts once it has returned.
+    """
+    pos = raw.find("{")
+    while pos != -1:
+        try:
+            obj, end = _decoder.raw_decode(raw, pos)
+        except ValueError:
+            pos = raw.find("{", pos + 1)
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        pos = raw.find("{", end)
+
+
+def extract_quiz_items(raw):
+    """
+    (mcqs, flashcards) as raw dicts from any model answer: a JSON array of
+    MCQs, a {"mcqs": [...], "flashcards": [...]} object, or the complete
+    items of either when the JSON as a whole is broken.
+    """
+    mcqs, flashcards = [], []
+
+    def _collect(obj):
+        if isinstance(obj, list):
+            for item in obj:
+                _collect(item)
+        elif isinstance(obj, dict):
+            if "mcqs" in obj or "flashcards" in obj:
+                _collect(obj.get("mcqs"))
+                _collect(obj.get("flashcards"))
+            elif "options" in obj:
+                mcqs.append(obj)
+            elif obj.get("question") and obj.get("answer"):
+                flashcards.append(obj)
+
+    for obj in iter_json_objects(raw):
+        _collect(obj)
+    return mcqs, flashcards
+
+
+def validate_mcqs(parsed):
+    """Keep well-formed MCQs only, normalized to the frontend shape."""
+    validated = []
+    for i, item in enumerate(parsed if isinstance(parsed, list) else []):
+        if (not isinstance(item, dict) or
+            not isinstance(item.get("question"), str) or
+            not isinstance(item.get("options"), list) or
+            len(item["options"]) != 4 or
+            not isinstance(item.get("answer_index"), int) or
+            not 0 <= item["answer_index"] < 4):
+            log.warning("skipping invalid MCQ", extra={"index": i, "item": item})
+            continue
+        validated.append({
+            "question": item["question"].strip(),
+            "options": [str(o).strip() for o in item["options"]],
+            "correct": int(item["answer_index"]),
+            "explanation": (item.get("explanation") or "").strip()
+        })
+    return validated
+
+
+def validate_flashcards(parsed):
+    cards = []
+    for card in parsed if isinstance(parsed, list) else []:
+        if isinstance(card, dict) and card.get("question") and card.get("answer"):
+            cards.append({"question": str(card["question"]).strip(), "answer": str(card["answer"]).strip()})
+    return cards
+
+
+def question_key(item):
+    """Normalized question text, to drop repeats when a chunk is topped up."""
+    return _normalize_text(item.get("question") or "")
+
+
+def parse_flashcard_text(flashcard_text):
+    cards = []
+    pairs = _FLASHCARD.findall(flashcard_text)
+    for q, a in pairs:
+        cards.append({"question": q.strip(), "answer": a.strip()})
+    return cards
+
+
+def _try_load_json(s):
+    try:
+        return json.loads(s)
+    except Exception:
+        return None
+
+def _flatten_to_dicts(payload):
+    """Accepts: list/dict/str; returns flat list of dicts (no validation yet)."""
+    out = []
+    if payload is None:
+        return out
+    if isinstance(payload, str):
+        loaded = _try_load_json(payload)
+        if loaded is None:
+            return out
+        return _flatten_to_dicts(loaded)
+    if isinstance(payload, dict):
+        out.append(payload)
+        return out
+    if isinstance(payload, list):
+        for item in payload:
+            if isinstance(item, dict):
+                out.append(item)
+            elif isinstance(item, list):
+                out.extend(_flatten_to_dicts(item))
+            elif isinstance(item, str):
+                loaded = _try_load_json(item)
+                if loaded is not None:
+                    out.extend(_flatten_to_dicts(loaded))
+        return out
+    return out
+
+# Light tokenizer + crude stemmer (ly/ing/ed/es/s)
+def _normalize_text(s):
+    return _normalize_str(s if isinstance(s, str) else str(s or ''))
+
+@lru_cache(maxsize=4096)
+def _normalize_str(s):
+    return _NON_ALNUM.sub(' ', s.lower()).strip()
+
+def _stem_token(t):
+    for suf in ("ly", "ing", "ed", "es", "s"):
+        if len(t) > 3 and t.endswith(suf):
+            return t[: -len(suf)]
+    return t
+
+def _tokens(s):
+    return _stem_tokens(_normalize_text(s))
+
+@lru_cache(maxsize=4096)
+def _stem_tokens(normalized):
+    return tuple(_stem_token(t) for t in normalized.split() if t)
+
+def _substring_score(a, b):
+    # normalized substring presence
+    na, nb = _normalize_text(a), _normalize_text(b)
+    return 1.0 if na and na in nb else 0.0
+
+def _overlap_score(a, b):
+    ta, tb = set(_tokens(a)), set(_tokens(b))
+    if not ta:
+        return 0.0
+    return len(ta & tb) / len(ta)
+
+def _option_match_score(option, explanation):
+    # pick the stronger of substring match or token overlap
+    return max(_substring_score(option, explanation), _overlap_score(option, explanation))
+
+def _reconcile_correct(item):
+    """
+    Returns item coerced to {question, options, correct, explanation}.
+    If the provided correct index seems wrong, fix it using explanation/answer.
+    """
+    if not isinstance(item, dict):
+        return None
+
+    q = item.get("question")
+    opts = item.get("options")
+    expl = item.get("explanation") or ""
+
+    # Prefer explicit 'answer' string if present
+    explicit_answer = item.get("answer") or item.get("correct_answer") or None
+
+    # Accept either 'answer_index' or 'correct'
+    if "answer_index" in item:
+        corr = item.get("answer_index")
+    else:
+        corr = item.get("correct")
+
+    if not isinstance(q, str):
+        return None
+    if not isinstance(opts, list) or len(opts) != 4:
+        return None
+
+    # Try to enforce/repair correct index
+    fixed_idx = None
+
+    # 1) If explicit 'answer' matches an option, use that index
+    if explicit_answer:
+        for i, o in enumerate(opts):
+            if _normalize_text(o) == _normalize_text(explicit_answer):
+                fixed_idx = i
+                break
+
+    # 2) If no explicit match, use explanation similarity to choose best option
+    if fixed_idx is None:
+        scores = [ _option_match_score(o, expl) for o in opts ]
+        best_idx = max(range(len(opts)), key=lambda i: scores[i])
+        best_score = scores[best_idx]
+        # We'll only override if best score is meaningful or current is invalid
+        corr_valid = isinstance(corr, int) and 0 <= corr < 4
+        curr_score = scores[corr] if corr_valid else -1.0
+        if (not corr_valid) or (best_score > 0 and best_idx != corr and curr_score == 0):
+            fixed_idx = best_idx
+
+    # 3) Fall back to provided corr if still nothing
+    if fixed_idx is None:
+        if not isinstance(corr, int) or not (0 <= corr < 4):
+            corr = 0
+        fixed_idx = int(corr)
+
+    # Debug log when we changed it
+    if isinstance(corr, int) and corr != fixed_idx:
+        log.debug("adjusted MCQ answer from explanation match", extra={"from_index": corr, "to_index": fixed_idx})
+
+    return {
+        "question": q.strip(),
+        "options": [str(o).strip() for o in opts],
+        "correct": fixed_idx,
+        "explanation": str(expl).strip()
+    }
+
+
+@metrics.stage("postprocess")
+def normalize_mcqs(mcqs_raw):
+    # --------- Normalize + reconcile MCQs ----------
+    flat_mcq_items = _flatten_to_dicts(mcqs_raw)
+    mcqs = []
+    for it in flat_mcq_items:
+        fixed = _reconcile_correct(it)
+        if fixed:
+            mcqs.append(fixed)
+    return mcqs
+
+
+@metrics.stage("postprocess")
+def normalize_flashcards(flashcards_raw):
+    # --------- Parse flashcards (existing logic) ----------
+    flashcards = []
+    if isinstance(flashcards_raw, list):
+        for chunk in flashcards_raw:
+            if isinstance(chunk, str):
+                flashcards.extend(parse_flashcard_text(chunk))
+            elif isinstance(chunk, dict):
+                q = chunk.get("question") or chunk.get("q")
+                a = chunk.get("answer") or chunk.get("a")
+                if q and a:
+                    flashcards.append({"question": q.strip(), "answer": a.strip()})
+            elif isinstance(chunk, list):
+                for sub in chunk:
+                    if isinstance(sub, str):
+                        flashcards.extend(parse_flashcard_text(sub))
+                    elif isinstance(sub, dict):
+                        q = sub.get("question") or sub.get("q")
+                        a = sub.get("answer") or sub.get("a")
+                        if q and a:
+                            flashcards.append({"question": q.strip(), "answer": a.strip()})
+    elif isinstance(flashcards_raw, str):
+        flashcards = parse_flashcard_text(flashcards_raw)
+    return flashcards
@@ -0,0 +1,205 @@
+"""
+In-process Prometheus metrics, served as text on /metrics.
+
+- `counter(...)` / `histogram(...)` declare labelled metrics once, at import.
+- `stage(name)` times a pipeline stage and labels every LLM call made
+  inside it (also from run_concurrently workers, which copy contextvars).
+- `record_llm_call(...)` counts an LLM call's latency, tokens and cost.
+- `register_collector(fn)` adds values read at scrape time, e.g. the
+  hit/miss counters the caches already keep for /stats.
+"""
+import contextlib
+import contextvars
+import math
+import threading
+import time
+
+from config import LLM_USD_PER_MILLION_TOKENS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "yousummarizer_"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_stage = contextvars.ContextVar("metrics_stage", default="none")
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(row) for key, row in self._values.items()}
+        for key, row in sorted(values.items()):
+            for bound, count in zip(self.buckets, row):
+                yield (self.name + "_bucket",
+                       _format_labels(self.labels, key, [("le", _format_value(bound))]), count)
+            yield self.name + "_sum", _format_labels(self.labels, key), row[-2]
+            yield self.name + "_count", _format_labels(self.labels, key), row[-1]
+
+
+def counter(name, help, labels=()):
+    metric = Counter(name, help, labels)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, help, labels, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """
+    `collect()` is called on every scrape and returns
+    [(name, kind, help, [(labels dict, value), ...]), ...].
+    """
+    _collectors.append(collect)
+
+
+def cache_collector(caches):
+    """Collector for {cache name: stats function} returning hits/misses/evictions, as in /stats."""
+    def collect():
+        stats = {name: fn() for name, fn in caches.items()}
+        return [
+            (f"cache_{field}_total", "counter", f"Cache {field} since process start",
+             [({"cache": name}, s.get(field, 0)) for name, s in stats.items()])
+            for field in ("hits", "misses", "evictions")
+        ]
+    return collect
+
+
+STAGE_SECONDS = histogram(
+    "stage_duration_seconds", "Time spent in each pipeline stage", ["stage"])
+STAGE_ERRORS = counter(
+    "stage_errors_total", "Pipeline stages that raised", ["stage"])
+LLM_CALL_SECONDS = histogram(
+    "llm_call_duration_seconds", "Latency of single LLM calls", ["model", "stage"])
+LLM_CALLS = counter(
+    "llm_calls_total", "LLM calls by outcome", ["model", "stage", "outcome"])
+LLM_TOKENS = counter(
+    "llm_tokens_total", "Prompt and completion tokens sent to / received from LLMs", ["model", "stage", "kind"])
+LLM_COST = counter(
+    "llm_cost_usd_total", "Estimated LLM spend (LLM_USD_PER_MILLION_TOKENS)", ["model", "stage"])
+HTTP_SECONDS = histogram(
+    "http_request_duration_seconds", "Time to produce an HTTP response", ["method", "endpoint", "status"])
+
+
+def current_stage():
+    return _current_stage.get()
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as pipeline stage `name`; LLM calls inside it are labelled with it."""
+    token = _current_stage.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+        _current_stage.reset(token)
+
+
+def record_llm_call(model, seconds, prompt_tokens, completion_tokens, outcome="ok",
+                    usd_per_million=None, stage=None):
+    labels = {"model": model, "stage": stage or current_stage()}
+    LLM_CALLS.inc(outcome=outcome, **labels)
+    LLM_CALL_SECONDS.observe(seconds, **labels)
+    LLM_TOKENS.inc(prompt_tokens, kind="prompt", **labels)
+    LLM_TOKENS.inc(completion_tokens, kind="completion", **labels)
+    rate = LLM_USD_PER_MILLION_TOKENS if usd_per_million is None else usd_per_million
+    LLM_COST.inc((prompt_tokens + completion_tokens) * rate / 1e6, **labels)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f"# HELP {PREFIX}{name} {help}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in samples:
+                names = tuple(labels)
+                lines.append(f"{PREFIX}{name}{_format_labels(names, [labels[n] for n in names])} "
+                             f"{_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,207 @@
+import logging
+
+import metrics
+from concurrency import Cancelled
+from config import QUIZ_MODE, COALESCE_TIMEOUT_SECONDS, USE_CHUNK_DIGESTS
+from digests import digest_prompt_template, video_digests
+from mcq_flashcard_generator import chunk_transcript_for_mcq, generate_mcqs, generate_flashcards, generate_quiz
+from mcq_flashcard_generator import mcq_prompt_template, flashcard_prompt_template, quiz_prompt_template
+from mcq_validation import normalize_mcqs, normalize_flashcards
+from result_cache import cached_result
+from singleflight import SingleFlight
+from summarizer import adaptive_summarize, bullet_prompt, get_llm, summarize_notes, LLM_PARAMS
+from transcript_store import get_transcript, transcript_text, transcript_duration_minutes, transcript_id
+import usage
+from vector_utils import load_video_index, split_transcript_text_dynamic, store_chunks_in_chroma
+
+# The work behind /transcript and /mcq-flashcards, shared by the plain JSON
+# endpoints and their streaming variants. `progress(event, **data)` is called
+# as each stage finishes.
+
+# Concurrent requests for the same (endpoint, video_id, settings) share one
+# run. Only the request that started it sees progress events; the others
+# just get its result (or its exception).
+#
+# The key has no user in it. Each caller passes usage admission before
+# joining (usage.store.check), but only the leader's user is billed for the
+# run: followers cost no extra LLM work and ride free. A run refused for
+# its leader's quota, or given up because its leader's job was cancelled,
+# is not the followers' problem: they run it again.
+pipeline_flights = SingleFlight("pipeline run", retry_on=(usage.QuotaExceeded, Cancelled))
+
+log = logging.getLogger(__name__)
+
+
+def _no_progress(event, **data):
+    pass
+
+
+def load_transcript(video_id, progress=_no_progress):
+    # Step 1: Fetch transcript (shared on-disk cache, YouTube only on a miss)
+    raw_transcript = get_transcript(video_id)
+
+    # Step 1.5: Get video duration from the segments we already have
+    with metrics.stage("duration_lookup"):
+        video_duration = transcript_duration_minutes(raw_transcript)
+
+    # Step 2: Merge transcript into one long string
+    text = transcript_text(raw_transcript)
+    log.info("transcript loaded", extra={
+        "video_id": video_id, "minutes": round(video_duration, 1), "characters": len(text)})
+    progress("transcript", video_duration=video_duration, characters=len(text))
+    return text, video_duration
+
+
+def _prompt_chunks(llm, video_id, text, video_duration, refresh, report):
+    """
+    What the summary/quiz prompts read: the video's chunk digests (built by
+    whichever endpoint runs first), or None for the raw transcript chunks.
+    A transcript that fits in one prompt goes in as is: digesting it would
+    only add an LLM call in front of the one that reads it.
+    """
+    if not USE_CHUNK_DIGESTS or len(chunk_transcript_for_mcq(text, video_duration)) <= 1:
+        return None
+    return video_digests(llm, video_id, text, video_duration, refresh=refresh, progress=report)
+
+
+def _metered(compute, video_duration):
+    """
+    `compute` as a billed run for the current user: refused before any LLM
+    call if they are over quota or at their limit of runs in flight, with
+    the video's minutes charged once it starts. Only runs on a result-cache
+    miss, so cached videos cost nothing.
+    """
+    def run():
+        with usage.store.run(transcript_minutes=video_duration):
+            return compute()
+    return run
+
+
+def _templates(*templates):
+    # Results built from digests depend on the digest prompt too
+    return list(templates) + ([digest_prompt_template] if USE_CHUNK_DIGESTS else [])
+
+
+def summarize_video(video_id, refresh=False, progress=None, include_transcript=False):
+    """
+    The /transcript payload. The transcript text itself is only included
+    with `include_transcript`; otherwise clients get its `transcript_id`.
+    """
+    usage.store.check()
+    result = pipeline_flights.do(
+        ('summary', video_id, refresh),
+        lambda: _summarize_video(video_id, refresh, progress),
+        timeout=COALESCE_TIMEOUT_SECONDS,
+    )
+    if not include_transcript:
+        result = {k: v for k, v in result.items() if k != 'transcript'}
+    return result
+
+
+def _summarize_video(video_id, refresh, progress):
+    report = progress or _no_progress
+    text, video_duration = load_transcript(video_id, report)
+    documents = []  # embedding chunks, split once for the index and the summary and only if one needs them
+
+    def _documents():
+        if not documents:
+            # Step 3: Chunk using DYNAMIC chunking based on video length
+            documents.append(split_transcript_text_dynamic(text, video_duration))
+        return documents[0]
+
+    # The /rag index is kept apart from the summary cache: a video summarized
+    # before it had an index (or before VECTOR_STORE changed) gets one now
+    if text.strip() and load_video_index(video_id) is None:
+        store_chunks_in_chroma(_documents(), video_id=video_id)
+        report("stored", chunks=len(_documents()))
+
+    def _summarize():
+        if not text.strip():
+            # Nothing was said (e.g. a music-only video): nothing to index or summarize
+            return {'summary': "", 'chunks_created': 0}
+
+        # Step 4: Summarize the chunk digests, or the transcript directly (adaptive strategy)
+        llm = get_llm()
+        notes = _prompt_chunks(llm, video_id, text, video_duration, refresh, report)
+        if notes:
+            summary = summarize_notes(llm, notes, progress=progress)
+        else:
+            summary = adaptive_summarize(llm, text, video_duration, progress=progress)
+        return {'summary': summary, 'chunks_created': len(_documents())}
+
+    # Step 4 is skipped entirely when this video was already summarized
+    # with the same prompt and LLM settings (unless the client asks to refresh)
+    result = cached_result('summary', video_id, _metered(_summarize, video_duration),
+                           templates=_templates(bullet_prompt), llm_params=LLM_PARAMS, refresh=refresh)
+
+    log.info("summary ready", extra={"video_id": video_id, "characters": len(result['summary'])})
+    return {
+        'transcript': text,
+        'transcript_id': transcript_id(video_id, text),
+        'summary': result['summary'],
+        'video_duration': video_duration,
+        'chunks_created': result['chunks_created']
+    }
+
+
+def quiz_for_video(video_id, refresh=False, mode=QUIZ_MODE, progress=None):
+    usage.store.check()
+    return pipeline_flights.do(
+        ('quiz', video_id, refresh, mode),
+        lambda: _quiz_for_video(video_id, refresh, mode, progress),
+        timeout=COALESCE_TIMEOUT_SECONDS,
+    )
+
+
+def _quiz_for_video(video_id, refresh, mode, progress):
+    report = progress or _no_progress
+    text, video_duration = load_transcript(video_id, report)
+
+    # Step 3: Generate MCQs + Flashcards (LLM)
+    llm = get_llm()
+    if mode == 'combined':
+        # One prompt per chunk for both, chunks in parallel
+        def _on_chunk(index, total, chunk_mcqs, chunk_flashcards):
+            report("quiz_chunk", index=index, total=total,
+                   mcqs=normalize_mcqs(chunk_mcqs), flashcards=normalize_flashcards(chunk_flashcards))
+
+        def _quiz():
+            notes = _prompt_chunks(llm, video_id, text, video_duration, refresh, report)
+            mcqs, flashcards = generate_quiz(llm, text, video_duration, on_chunk=_on_chunk, chunks=notes)
+            return {'mcqs': mcqs, 'flashcards': flashcards}
+
+        quiz = cached_result('quiz', video_id, _metered(_quiz, video_duration),
+                             templates=_templates(quiz_prompt_template), llm_params=LLM_PARAMS, refresh=refresh)
+        mcqs_raw, flashcards_raw = quiz['mcqs'], quiz['flashcards']
+    else:
+        notes = []  # digests, looked up once for both passes and only if one of them runs
+
+        def _notes():
+            if not notes:
+                notes.append(_prompt_chunks(llm, video_id, text, video_duration, refresh, report))
+            return notes[0]
+
+        def _mcqs():
+            return generate_mcqs(llm, text, video_duration, chunks=_notes())
+
+        def _flashcards():
+            return generate_flashcards(llm, text, video_duration, chunks=_notes())
+
+        # The video's minutes are charged once: to the MCQ pass, or to the
+        # flashcard pass if the MCQs came from the cache (`notes` still empty)
+        mcqs_raw = cached_result('mcqs', video_id, _metered(_mcqs, video_duration),
+                                 templates=_templates(mcq_prompt_template), llm_params=LLM_PARAMS, refresh=refresh)
+        flashcards_raw = cached_result('flashcards', video_id,
+                                       _metered(_flashcards, 0 if notes else video_duration),
+                                       templates=_templates(flashcard_prompt_template), llm_params=LLM_PARAMS,
+                                       refresh=refresh)
+
+    mcqs = normalize_mcqs(mcqs_raw)
+    flashcards = normalize_flashcards(flashcards_raw)
+    log.info("quiz ready", extra={"video_id": video_id, "mcqs": len(mcqs), "flashcards": len(flashcards)})
+
+    return {
+        'video_duration': video_duration,
+        'mcqs': mcqs,
+        'flashcards': flashcards
+    }
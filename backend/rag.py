@@ -1,11 +1,17 @@
 from langchain.schema import Document
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_community.llms import HuggingFacePipeline
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from transformers import pipeline
+
+import time
+
+import metrics
+from chunking import count_tokens
+from embeddings import get_embeddings
+from batching import MicroBatcher
+from config import RETRIEVER_CACHE_MAX_BYTES, RAG_MAX_BATCH_SIZE, RAG_MAX_WAIT_MS
+from resources import lazy_resource
+from retriever_cache import ByteLRUCache, estimate_faiss_bytes, transcript_hash
+from vector_utils import load_video_index
 
 # Prompt template
 prompt_template = """
@@ -25,10 +31,42 @@ Guidelines:
 """
 qa_prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
 
-# Embeddings & LLM
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-generator = pipeline("text-generation", model="google/flan-t5-base", max_length=512, temperature=0)
-llm = HuggingFacePipeline(pipeline=generator)
+# LLM (embeddings come from the shared embedding service).
+# transformers + flan-t5 take seconds to load, so only do it on the first /rag call.
+def _load_generator():
+    from langchain_community.llms import HuggingFacePipeline
+    from transformers import pipeline
+    generator = pipeline("text-generation", model="google/flan-t5-base", max_length=512, temperature=0)
+    return HuggingFacePipeline(pipeline=generator, batch_size=RAG_MAX_BATCH_SIZE)
+
+
+rag_llm = lazy_resource("rag_generator", _load_generator)
+
+
+def _generate_batch(prompts):
+    # One batched forward pass for every prompt collected in the window
+    started = time.perf_counter()
+    result = rag_llm.get().generate(prompts)
+    answers = [generations[0].text for generations in result.generations]
+    # Runs on the batcher thread, outside the request's stage context
+    metrics.record_llm_call(
+        "google/flan-t5-base",
+        time.perf_counter() - started,
+        sum(count_tokens(p) for p in prompts),
+        sum(count_tokens(a) for a in answers),
+        usd_per_million=0.0,  # local model
+        stage="rag",
+    )
+    return answers
+
+
+# Concurrent /rag requests wait up to RAG_MAX_WAIT_MS to share a batch
+rag_batcher = MicroBatcher(
+    _generate_batch,
+    max_batch_size=RAG_MAX_BATCH_SIZE,
+    max_wait=RAG_MAX_WAIT_MS / 1000,
+    name="rag-generator-batcher",
+)
 
 # Convert transcript to chunks
 def transcript_to_docs(transcript_text):
@@ -36,19 +74,52 @@ def transcript_to_docs(transcript_text):
     chunks = splitter.split_text(transcript_text)
     return [Document(page_content=c) for c in chunks]
 
-# Build RAG chain directly from transcript using FAISS in-memory
-def answer_query(query, transcript_text):
-    docs = transcript_to_docs(transcript_text)
-    vectorstore = FAISS.from_documents(docs, embeddings)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-
-    chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-        chain_type="stuff",
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": qa_prompt}
+class VideoNotIndexed(LookupError):
+    """/rag was asked about a video that hasn't been through /transcript (or a job) yet."""
+
+
+def video_index(video_id):
+    """
+    The video's persisted index, built when the video was ingested at
+    /transcript. /rag never fetches or indexes a video itself: that is paid
+    for (and admitted) on the signed-in routes.
+    """
+    vectordb = load_video_index(video_id)
+    if vectordb is None:
+        raise VideoNotIndexed(f"video {video_id} has not been processed yet; summarize it first")
+    return vectordb
+
+
+# Build RAG retriever directly from transcript using FAISS in-memory,
+# kept in a byte-bounded LRU so follow-up questions skip the rebuild
+retriever_cache = ByteLRUCache(RETRIEVER_CACHE_MAX_BYTES, name="retriever")
+
+
+def transcript_index(transcript_text):
+    def _build():
+        from langchain.vectorstores import FAISS
+        docs = transcript_to_docs(transcript_text)
+        return FAISS.from_documents(docs, get_embeddings()), docs
+
+    vectorstore, _ = retriever_cache.get_or_build(
+        transcript_hash(transcript_text),
+        _build,
+        sizeof=lambda built: estimate_faiss_bytes(*built),
     )
+    return vectorstore
+
+
+@metrics.stage("rag")
+def answer_query(query, transcript_text=None, video_id=None):
+    """Answer `query` from the video's persisted index (by video_id) or from a transcript sent by the client."""
+    if video_id:
+        vectorstore = video_index(video_id)
+    else:
+        vectorstore = transcript_index(transcript_text)
 
-    result = chain({"query": query})
-    return result["result"], result["source_documents"]
+    # "stuff" the top 3 excerpts into the QA prompt
+    with metrics.stage("retrieval"):
+        source_documents = vectorstore.similarity_search(query, k=3)
+    context = "\n\n".join(doc.page_content for doc in source_documents)
+    result = rag_batcher.submit(qa_prompt.format(context=context, question=query)).result()
+    return result, source_documents
@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class LazyResource:
+    """
+    A heavy object (model, client, ...) built by `factory` on first `get()`,
+    once per process, with its load state recorded for /ready.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+        self.state = "not_loaded"
+        self.load_seconds = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self.state == "ready"
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.state = "error"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self.state = "ready"
+                log.info("resource loaded", extra={"resource": self.name, "seconds": round(self.load_seconds, 3)})
+        return self._value
+
+    def status(self):
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+_registry = {}
+
+
+def lazy_resource(name, factory):
+    resource = _registry[name] = LazyResource(name, factory)
+    return resource
+
+
+def readiness():
+    return {name: resource.status() for name, resource in _registry.items()}
+
+
+def warm_up(names=None):
+    """Load resources on a background thread so the first request doesn't pay for them."""
+    def _load():
+        for name in names or list(_registry):
+            try:
+                _registry[name].get()
+            except Exception as e:
+                log.warning("warm-up failed", extra={"resource": name, "error": str(e)})
+
+    thread = threading.Thread(target=_load, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import logging
+import os
+
+from config import CACHE_DIR, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS
+from disk_cache import DiskCache
+
+log = logging.getLogger(__name__)
+
+# Generated summaries / MCQs / flashcards, so repeat requests for the same
+# video and generation settings don't spend any LLM tokens.
+_cache = DiskCache(
+    os.path.join(CACHE_DIR, "results.sqlite3"),
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    ttl=RESULT_CACHE_TTL_SECONDS,
+)
+
+
+def prompt_hash(*templates):
+    """Stable hash of the prompt templates a result was generated with."""
+    digest = hashlib.sha256()
+    for template in templates:
+        # Accept both raw strings and LangChain PromptTemplate objects
+        digest.update(getattr(template, "template", template).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def result_key(kind, video_id, templates, llm_params, settings=None):
+    payload = json.dumps(
+        {
+            "prompts": prompt_hash(*templates),
+            "llm": llm_params,
+            "settings": settings or {},
+        },
+        sort_keys=True,
+    )
+    return f"{kind}:{video_id}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]}"
+
+
+def cached_result(kind, video_id, compute, templates, llm_params, settings=None, refresh=False):
+    """
+    Return the cached result for (kind, video_id, prompts, LLM params, settings),
+    calling `compute()` and storing its value on a miss.
+    `refresh=True` skips the lookup and overwrites whatever was cached.
+    """
+    key = result_key(kind, video_id, templates, llm_params, settings)
+    if not refresh:
+        cached = _cache.get(key)
+        if cached is not None:
+            log.info("result cache hit", extra={"kind": kind, "video_id": video_id})
+            return cached
+    result = compute()
+    _cache.set(key, result)
+    return result
+
+
+def cache_stats():
+    return _cache.stats()
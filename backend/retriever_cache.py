@@ -0,0 +1,87 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+
+# Rough per-chunk cost of the Document object, its metadata and docstore entry
+_PER_DOC_OVERHEAD = 600
+
+
+def transcript_hash(transcript_text):
+    return hashlib.sha256(transcript_text.encode("utf-8")).hexdigest()
+
+
+def estimate_faiss_bytes(vectorstore, docs):
+    """Vectors (float32) + chunk text + object overhead for an in-memory FAISS store."""
+    index = vectorstore.index
+    vector_bytes = index.ntotal * index.d * 4
+    text_bytes = sum(sys.getsizeof(doc.page_content) + _PER_DOC_OVERHEAD for doc in docs)
+    return vector_bytes + text_bytes
+
+
+class ByteLRUCache:
+    """
+    Thread-safe in-process LRU cache bounded by an estimated byte budget
+    rather than an entry count. Misses for the same key are built once.
+    """
+
+    def __init__(self, max_bytes, name="cache"):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._builds = SingleFlight(f"{name} build")
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self.resident_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                # Bigger than the whole budget: serve it, don't keep it
+                return
+            self._entries[key] = (value, size)
+            self.resident_bytes += size
+            while self.resident_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.resident_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, key, build, sizeof):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def _build():
+            value = build()
+            self.put(key, value, sizeof(value))
+            return value
+
+        return self._builds.do(key, _build)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
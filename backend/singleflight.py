@@ -0,0 +1,86 @@
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key: the first caller runs
+    `fn`, everyone who arrives while it is in flight waits for that result
+    (or exception) instead of doing the work again.
+
+    Exceptions of a `retry_on` type are about the leader itself (e.g. its
+    user's quota), not the work: waiters that get one run `fn` again
+    (one of them leading) instead of failing with it.
+    """
+
+    def __init__(self, name, retry_on=()):
+        self.name = name
+        self.retry_on = retry_on
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.retried = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        log.info("joined in-flight call", extra={"flight": self.name, "key": str(key)})
+        if not call.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"timed out after {timeout}s waiting for in-flight {self.name}")
+        if call.error is not None:
+            if isinstance(call.error, self.retry_on):
+                with self._lock:
+                    self.retried += 1
+                log.info("in-flight call failed for its leader only, retrying", extra={
+                    "flight": self.name, "key": str(key), "error": str(call.error)})
+                return self.do(key, fn, timeout)
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "retried": self.retried,
+            }
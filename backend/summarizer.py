@@ -1,14 +1,24 @@
-from langchain.chains.summarize import load_summarize_chain
-from langchain_community.llms.together import Together
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import hashlib
+import json
+import logging
+import os
 
-embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-from langchain.chains.summarize import load_summarize_chain
+from embeddings import get_embeddings
 from langchain.schema import Document
-import math
 
 from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+
+import metrics
+from chunking import chunk_text, count_tokens, token_budget
+from concurrency import run_concurrently
+from config import SUMMARY_MAX_WORKERS, SUMMARY_CHUNK_TIMEOUT, SUMMARY_CHUNK_RETRIES
+from config import CACHE_DIR, RESULT_CACHE_TTL_SECONDS, SUMMARY_REDUCE_FAN_IN, SUMMARY_NODE_CACHE_MAX_BYTES
+from disk_cache import DiskCache
+from resources import lazy_resource
+from result_cache import prompt_hash
+
+log = logging.getLogger(__name__)
 
 bullet_prompt = PromptTemplate.from_template("""
 Write a detailed summary of the following transcript. 
@@ -20,72 +30,219 @@ Write a detailed summary of the following transcript.
 
 {text}
 """)
-def adaptive_summarize(llm, full_transcript: str, video_duration_minutes: int) -> str:
+@metrics.stage("summary")
+def adaptive_summarize(llm, full_transcript: str, video_duration_minutes: int, progress=None) -> str:
     """
-    Summarizes a YouTube transcript based on the video duration.
-    - ≤ 30 min: summarize whole transcript in one go.
-    - > 30 and ≤ 60 min: split in 2, summarize, then combine.
-    - > 60 min: proportional chunking (2 chunks per hour).
+    Summarizes a YouTube transcript in as few LLM calls as its length allows.
+    - Transcript fits in one prompt: summarize it in one go.
+    - Otherwise: sentence-aware chunks packed up to the model's context
+      budget, summarized concurrently, then combined.
+    (`video_duration_minutes` is only used for logging; chunking is by tokens.)
+    With `progress(event, **data)`, reports each finished chunk and streams
+    the tokens of the final summary as "token" events.
     """
-    # Convert transcript string to a LangChain Document
-    full_doc = Document(page_content=full_transcript)
+    with metrics.stage("chunking"):
+        budget = token_budget(bullet_prompt, max_new_tokens=LLM_PARAMS["max_tokens"])
+        chunks = chunk_text(full_transcript, budget)
 
-    if video_duration_minutes <= 30:
-        print("▶ Summarizing without chunking (≤ 30 min)")
+    if len(chunks) <= 1:
+        log.info("summarizing in one prompt", extra={"minutes": round(video_duration_minutes)})
+        if progress is not None:
+            return _stream_summary(llm, full_transcript, progress)
+        # Convert transcript string to a LangChain Document
+        full_doc = Document(page_content=full_transcript)
+        from langchain.chains.summarize import load_summarize_chain
         chain = load_summarize_chain(
             llm, 
             chain_type="stuff", 
-            verbose=True, 
             prompt=bullet_prompt
         )
         return chain.run([full_doc])
-    
-    elif video_duration_minutes <= 60:
-        print("▶ Summarizing with 2 chunks (30–60 min)")
-        mid_point = len(full_transcript) // 2
-        chunks = [
-            Document(page_content=full_transcript[:mid_point]),
-            Document(page_content=full_transcript[mid_point:])
-        ]
-        chain = load_summarize_chain(
-            llm, 
-            chain_type="map_reduce", 
-            verbose=True, 
-            prompt=bullet_prompt
-        )
-        return chain.run(chunks)
-    
-    else:
-        print("▶ Summarizing with proportional chunking (> 60 min)")
-        # Calculate number of chunks = 2 × hours
-        num_chunks = int(math.ceil(2 * (video_duration_minutes / 60)))
-        chunk_size = len(full_transcript) // num_chunks
-        chunks = [
-            Document(page_content=full_transcript[i * chunk_size: (i + 1) * chunk_size])
-            for i in range(num_chunks)
-        ]
-        chain = load_summarize_chain(
-            llm, 
-            chain_type="stuff", 
-            verbose=True, 
-            prompt=bullet_prompt
-        )
-        return chain.run(chunks)
 
+    log.info("summarizing with map-reduce", extra={"chunks": len(chunks), "minutes": round(video_duration_minutes)})
+    return map_reduce_summarize(llm, chunks, progress=progress)
 
-def get_llm():
-    return Together(
-        model="mistralai/Mistral-7B-Instruct-v0.1",
-        temperature=0.7,
-        max_tokens=1024
+
+def _stream_summary(llm, text, progress):
+    parts = []
+    for token in llm.stream(bullet_prompt.format(text=text)):
+        parts.append(token)
+        progress("token", text=token)
+    return "".join(parts)
+
+
+# Every node of the summary tree (chunk summaries and intermediate merges),
+# keyed by its input text, so a run that failed halfway only redoes the
+# nodes that never finished.
+_nodes = DiskCache(
+    os.path.join(CACHE_DIR, "summary_nodes.sqlite3"),
+    max_bytes=SUMMARY_NODE_CACHE_MAX_BYTES,
+    ttl=RESULT_CACHE_TTL_SECONDS,
+)
+
+
+def _node_key(text):
+    settings = json.dumps({"prompt": prompt_hash(bullet_prompt), "llm": LLM_PARAMS}, sort_keys=True)
+    return hashlib.sha256(f"{settings}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _summarize_node(summarize, text):
+    key = _node_key(text)
+    summary = _nodes.get(key)
+    if summary is None:
+        summary = summarize(text)
+        _nodes.set(key, summary)
+    return summary
+
+
+def reduce_groups(summaries, budget, fan_in=None):
+    """
+    Split `summaries` into consecutive groups to merge in one call each, with
+    at most `fan_in` summaries and `budget` tokens per group. A leftover
+    single summary at the end takes one from the group before it when that
+    fits; otherwise it stays a group of one (carried to the next level as is).
+    """
+    fan_in = max(2, fan_in or SUMMARY_REDUCE_FAN_IN)
+    groups, group, tokens = [], [], 0
+    for summary in summaries:
+        size = count_tokens(summary)
+        if group and (len(group) >= fan_in or tokens + size > budget):
+            groups.append(group)
+            group, tokens = [], 0
+        group.append(summary)
+        tokens += size
+    if group:
+        groups.append(group)
+    if len(groups) > 1 and len(groups[-1]) == 1 and len(groups[-2]) > 2:
+        moved = groups[-2][-1]
+        if count_tokens(moved) + count_tokens(groups[-1][0]) <= budget:
+            groups[-1].insert(0, groups[-2].pop())
+    return groups
+
+
+def map_reduce_summarize(llm, chunks, max_workers=None, chunk_timeout=None, retries=None, progress=None):
+    """
+    Hierarchical map-reduce, so even 10-hour streams never overflow the context:
+    - Map: summarize every chunk concurrently on a bounded thread pool
+      (per-chunk timeout, only failed chunks are retried).
+    - Reduce: tree_reduce() the chunk summaries into the final notes.
+    Every node is persisted (_nodes), so re-running after a failure skips
+    everything that already finished.
+    """
+    settings = _tree_settings(max_workers, chunk_timeout, retries)
+    chain = LLMChain(llm=llm, prompt=bullet_prompt)
+
+    on_done = None
+    if progress is not None:
+        on_done = lambda i, _: progress("chunk_summarized", index=i, total=len(chunks))
+    summaries = _summarize_level(chain, chunks, settings, on_done)
+    log.info("summarized chunks", extra={"chunks": len(chunks), "max_workers": settings["max_workers"]})
+
+    if len(summaries) == 1:
+        return summaries[0]
+    return tree_reduce(llm, summaries, progress=progress, **settings)
+
+
+@metrics.stage("summary")
+def summarize_notes(llm, notes, progress=None):
+    """
+    Summary of a video from its per-chunk digests (digests.py) instead of the
+    raw transcript: the digests are the leaves of the tree, no map step.
+    """
+    return tree_reduce(llm, notes, progress=progress)
+
+
+def tree_reduce(llm, summaries, max_workers=None, chunk_timeout=None, retries=None, progress=None):
+    """
+    Merge `summaries` in groups of at most SUMMARY_REDUCE_FAN_IN that fit one
+    prompt, all groups of a level in parallel, level by level until one
+    summary is left: log(len(summaries)) sequential LLM rounds, at least one.
+    With `progress`, the root merge is streamed as "token" events.
+    Nothing to merge (no summaries) gives an empty summary.
+    """
+    if not summaries:
+        return ""
+    settings = _tree_settings(max_workers, chunk_timeout, retries)
+    budget = token_budget(bullet_prompt, max_new_tokens=LLM_PARAMS["max_tokens"])
+    chain = LLMChain(llm=llm, prompt=bullet_prompt)
+
+    level = 0
+    while True:
+        level += 1
+        groups = reduce_groups(summaries, budget)
+        if len(groups) == 1 and progress is not None:
+            text = "\n\n".join(groups[0])
+            root = _nodes.get(_node_key(text))
+            if root is not None:
+                progress("token", text=root)
+                return root
+            return _summarize_node(lambda text: _stream_summary(llm, text, progress), text)
+        # Groups of one go up a level unchanged, unless nothing pairs up at
+        # all (summaries too long to share a prompt): then each is condensed
+        merge = [i for i, group in enumerate(groups) if len(group) > 1]
+        if not merge or len(groups) == 1:
+            merge = list(range(len(groups)))
+        texts = ["\n\n".join(groups[i]) for i in merge]
+        on_done = None
+        if progress is not None:
+            on_done = lambda i, _, level=level, total=len(texts): progress(
+                "summary_reduced", level=level, index=i, total=total)
+        merged = _summarize_level(chain, texts, settings, on_done)
+        summaries = [group[0] for group in groups]
+        for i, summary in zip(merge, merged):
+            summaries[i] = summary
+        log.info("reduced summaries", extra={"level": level, "nodes": len(texts)})
+        if len(summaries) == 1:
+            return summaries[0]
+
+
+def _tree_settings(max_workers, chunk_timeout, retries):
+    return {
+        "max_workers": max_workers or SUMMARY_MAX_WORKERS,
+        "chunk_timeout": chunk_timeout or SUMMARY_CHUNK_TIMEOUT,
+        "retries": SUMMARY_CHUNK_RETRIES if retries is None else retries,
+    }
+
+
+def _summarize_level(chain, texts, settings, on_done):
+    return run_concurrently(
+        lambda text: _summarize_node(lambda t: chain.run(text=t), text),
+        texts,
+        max_workers=settings["max_workers"],
+        timeout=settings["chunk_timeout"],
+        retries=settings["retries"],
+        on_done=on_done,
     )
 
+
+# Generation settings shared by every Together client (also part of the result cache key)
+LLM_PARAMS = {
+    "model": "mistralai/Mistral-7B-Instruct-v0.1",
+    "temperature": 0.7,
+    "max_tokens": 1024,
+}
+
+
+def _load_together():
+    from together_client import PooledTogether
+    return PooledTogether(**LLM_PARAMS)
+
+
+# One Together client for the process instead of one per request
+together_llm = lazy_resource("together_llm", _load_together)
+
+
+def get_llm():
+    return together_llm.get()
+
 def load_vectorstore(persist_directory="chroma_db"):
+    from langchain_community.vectorstores import Chroma
     return Chroma(
-        embedding_function=embedding_model,
+        embedding_function=get_embeddings(),
         persist_directory=persist_directory
     )
 
 def summarize_with_map_reduce(llm, docs):
-    chain = load_summarize_chain(llm, chain_type="map_reduce", verbose=True)
+    from langchain.chains.summarize import load_summarize_chain
+    chain = load_summarize_chain(llm, chain_type="map_reduce")
     return chain.run(docs)
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other flat (`import config`) and open
+# their on-disk caches under CACHE_DIR at import time
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="backend_tests_cache_"))
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+os.environ.setdefault("LANGSMITH_API_KEY", "")
+os.environ.setdefault("TOGETHER_API_KEY", "test-key")
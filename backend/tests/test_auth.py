@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+import auth
+
+SECRET = "test-secret"
+
+
+@pytest.fixture(autouse=True)
+def local_tokens(monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "SUPABASE_JWT_AUDIENCE", "authenticated")
+    monkeypatch.setattr(auth, "_cache", {})
+    monkeypatch.setattr(auth, "_revoked", {})
+
+
+def _token(user, exp):
+    return auth.mint_token({"sub": user, "aud": "authenticated", "exp": exp}, secret=SECRET)
+
+
+def test_revoked_token_is_refused_until_it_expires(monkeypatch):
+    monkeypatch.setattr(auth, "_fetch_remote_user", lambda token: None)
+    exp = time.time() + 3600
+    token = _token("alice", exp)
+    assert auth.validate_supabase_token(token)["id"] == "alice"
+
+    auth._recheck(token)
+    assert auth._revoked == {token: exp}
+    assert auth.validate_supabase_token(token) is None
+
+    # Kept through the leeway after exp, dropped once the token is dead anyway
+    auth._prune(exp + auth.LEEWAY_SECONDS - 1)
+    assert token in auth._revoked
+    auth._prune(exp + auth.LEEWAY_SECONDS + 1)
+    assert auth._revoked == {}
+
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return {"id": "alice"}
+
+
+@pytest.mark.parametrize("failure", [503, TimeoutError("read timed out")])
+def test_supabase_outage_is_not_a_revocation(monkeypatch, failure):
+    def get(url, **kwargs):
+        if isinstance(failure, Exception):
+            raise failure
+        return _Response(failure)
+
+    monkeypatch.setattr(auth.http_clients.supabase, "get", get)
+    token = _token("alice", time.time() + 3600)
+    assert auth.validate_supabase_token(token)["id"] == "alice"
+
+    auth._recheck(token)
+    assert auth._revoked == {}
+    assert auth.validate_supabase_token(token)["id"] == "alice"
+
+
+@pytest.mark.parametrize("status", [401, 403])
+def test_supabase_rejection_revokes(monkeypatch, status):
+    monkeypatch.setattr(auth.http_clients.supabase, "get", lambda url, **kwargs: _Response(status))
+    token = _token("alice", time.time() + 3600)
+    assert auth.validate_supabase_token(token)["id"] == "alice"
+
+    auth._recheck(token)
+    assert auth.validate_supabase_token(token) is None
+
+
+def test_jwks_is_fetched_through_the_pooled_session(monkeypatch):
+    pyjwt = pytest.importorskip("jwt")
+    rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = pyjwt.algorithms.RSAAlgorithm.to_jwk(key.public_key(), as_dict=True)
+    jwks = {"keys": [{**jwk, "kid": "key-1", "alg": "RS256", "use": "sig"}]}
+
+    fetched = []
+
+    class JWKSResponse(_Response):
+        def json(self):
+            return jwks
+
+    def get(url, **kwargs):
+        fetched.append(url)
+        return JWKSResponse(200)
+
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", None)
+    monkeypatch.setattr(auth, "SUPABASE_JWKS_URL", "https://example.supabase.co/auth/v1/.well-known/jwks.json")
+    monkeypatch.setattr(auth, "_jwks", None)
+    monkeypatch.setattr(auth.http_clients.supabase, "get", get)
+
+    def token(user, kid):
+        claims = {"sub": user, "aud": "authenticated", "exp": time.time() + 3600}
+        return pyjwt.encode(claims, key, algorithm="RS256", headers={"kid": kid})
+
+    assert auth.validate_supabase_token(token("alice", "key-1"))["id"] == "alice"
+    assert auth.validate_supabase_token(token("bob", "key-1"))["id"] == "bob"
+    assert fetched == [auth.SUPABASE_JWKS_URL]
+
+    # A key id we don't know right after a fetch is refused without hammering Supabase
+    assert auth.validate_supabase_token(token("carol", "key-2")) is None
+    assert len(fetched) == 1
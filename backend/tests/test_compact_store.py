@@ -0,0 +1,27 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from compact_store import CompactVectorStore
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_build_and_search(tmp_path, dtype):
+    vectors = np.eye(3, dtype=np.float32)
+    store = CompactVectorStore.build(str(tmp_path / "index"), ["a", "b", "c"], vectors, dtype=dtype)
+    assert len(store) == 3
+    score, row = store.search([0, 1, 0], k=1)[0]
+    assert row == 1 and store.text(row) == "b"
+    assert score == pytest.approx(1.0, abs=1e-2)
+
+
+def test_build_without_chunks_is_a_clear_error(tmp_path):
+    path = tmp_path / "index"
+    with pytest.raises(ValueError, match="without chunks"):
+        CompactVectorStore.build(str(path), [], [])
+    assert not CompactVectorStore.exists(str(path))
+
+
+def test_build_with_mismatched_texts_and_vectors(tmp_path):
+    with pytest.raises(ValueError, match="2 texts but 1 vectors"):
+        CompactVectorStore.build(str(tmp_path / "index"), ["a", "b"], [[1.0, 0.0]])
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from concurrency import Cancelled, run_concurrently
+from jobs import JobCancelled
+
+
+class Flaky(Exception):
+    pass
+
+
+def _counting(fn):
+    calls = []
+    lock = threading.Lock()
+
+    def counted(item):
+        with lock:
+            calls.append(item)
+        return fn(item)
+
+    return counted, calls
+
+
+def test_failed_items_are_retried():
+    seen = set()
+
+    def fail_once(item):
+        if item not in seen:
+            seen.add(item)
+            raise Flaky(item)
+        return item * 2
+
+    fn, calls = _counting(fail_once)
+    assert run_concurrently(fn, list(range(5)), max_workers=2, retries=1) == [0, 2, 4, 6, 8]
+    assert len(calls) == 10
+
+
+def test_cancelling_from_on_done_stops_the_run():
+    fn, calls = _counting(lambda item: item)
+
+    def on_done(i, result):
+        raise JobCancelled("job")
+
+    with pytest.raises(JobCancelled):
+        run_concurrently(fn, list(range(10)), max_workers=1, retries=2, on_done=on_done)
+    # Not retried, and nothing started after the cancellation
+    assert len(calls) == 1
+
+
+def test_cancelled_item_is_not_retried():
+    def cancel(item):
+        raise Cancelled(item)
+
+    fn, calls = _counting(cancel)
+    with pytest.raises(Cancelled):
+        run_concurrently(fn, list(range(10)), max_workers=1, retries=2)
+    assert len(calls) == 1
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import disk_cache
+from disk_cache import DiskCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(disk_cache.time, "time", lambda: now[0])
+    return now
+
+
+def _stored_bytes(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path, clock):
+    # json.dumps("xxxxxxxx") is 10 bytes: room for three entries
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=30)
+    for key in "abc":
+        cache.set(key, "x" * 8)
+        clock[0] += 1
+    assert cache.get("a") == "x" * 8  # now the most recently used
+    clock[0] += 1
+
+    cache.set("d", "x" * 8)
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_missing(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=1000, ttl=60)
+    cache.set("a", 1)
+    clock[0] += 30
+    cache.set("b", 2)
+    clock[0] += 31
+    assert "a" not in cache
+    assert cache.get("a") is None
+    assert cache.get_many(["a", "b"]) == {"b": 2}
+
+    # Reading doesn't extend the TTL: it counts from when the entry was set
+    clock[0] += 30
+    assert cache.get("b") is None
+
+
+def test_running_total_follows_every_write(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = DiskCache(path, max_bytes=1000, ttl=60)
+    cache.set("a", "x" * 10)
+    cache.set("a", "x" * 100)  # replaced, not added
+    cache.set_many({"b": [1, 2, 3], "c": {"k": "v"}})
+    cache.delete("c")
+    clock[0] += 61
+    cache.set("d", 1)  # expires a and b
+    assert cache.stats()["bytes"] == _stored_bytes(cache) == 1
+
+    # Another process sharing the file sees the same total
+    other = DiskCache(path, max_bytes=1000, ttl=60)
+    other.set("e", "x" * 10)
+    assert cache.stats()["bytes"] == _stored_bytes(cache) == 13
+
+
+def test_total_is_seeded_from_a_file_written_before_it_existed(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+        "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO entries VALUES ('a', X'31', 1, 0, 0), ('b', X'3232', 2, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = DiskCache(path, max_bytes=1000)
+    assert cache.stats()["bytes"] == 3
+    cache.set("a", 10)
+    assert cache.stats()["bytes"] == _stored_bytes(cache) == 4
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from disk_cache import DiskCache
+from embeddings import EmbeddingService
+
+
+class CountingModel:
+    def __init__(self):
+        self.texts = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def _service(path, model):
+    service = EmbeddingService("test-model", DiskCache(str(path), max_bytes=1 << 20), batch_wait=0)
+    service._model._factory = lambda: model
+    return service
+
+
+def test_each_text_is_embedded_once(tmp_path):
+    model = CountingModel()
+    service = _service(tmp_path / "embeddings.sqlite3", model)
+    assert service.embed_documents(["a", "bb", "a"]) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert service.embed_query("bb") == [2.0, 1.0]
+    assert sorted(model.texts) == ["a", "bb"]
+
+
+def test_vectors_outlive_the_process(tmp_path):
+    path = tmp_path / "embeddings.sqlite3"
+    _service(path, CountingModel()).embed_documents(["a", "bb"])
+
+    model = CountingModel()
+    restarted = _service(path, model)
+    assert restarted.embed_documents(["bb", "ccc"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert model.texts == ["ccc"]
+
+
+def test_concurrent_callers_share_the_cache(tmp_path):
+    model = CountingModel()
+    service = _service(tmp_path / "embeddings.sqlite3", model)
+    texts = [f"text {i}" for i in range(20)]
+    service.embed_documents(texts)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.embed_documents(texts)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(results) == 4
+    assert len(model.texts) == len(texts)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from jobs import JobQueue
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_queues_sharing_a_file_run_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+    lock = threading.Lock()
+
+    def handler(params, progress):
+        with lock:
+            runs.append(params["n"])
+        time.sleep(0.01)
+        return params["n"]
+
+    first = JobQueue(path, {"work": handler}, workers=3)
+    second = JobQueue(path, {"work": handler}, workers=3)
+    job_ids = [first.submit("work", {"n": n}) for n in range(20)]
+    first.start()
+    second.start()
+
+    _wait_for(lambda: all(first.get(job_id)["status"] == "done" for job_id in job_ids))
+    assert sorted(runs) == list(range(20))
+
+
+def test_start_requeues_only_jobs_of_dead_workers(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    release = threading.Event()
+    live = JobQueue(path, {"work": lambda params, progress: release.wait(10)}, workers=1)
+    job_id = live.submit("work", {})
+    live.start()
+    _wait_for(lambda: live.get(job_id)["status"] == "running")
+
+    # Another process starting up leaves a job with a fresh heartbeat alone...
+    other = JobQueue(path, {"work": lambda params, progress: None}, workers=0)
+    other.start()
+    assert other.get(job_id)["status"] == "running"
+
+    # ...and takes it back once that heartbeat is stale
+    other.stale_after = -1
+    with other._lock:
+        other._requeue_stale()
+    assert other.get(job_id)["status"] == "queued"
+    release.set()
+
+
+def test_cancel_reaches_the_process_running_the_job(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    started, stopped = threading.Event(), threading.Event()
+
+    def handler(params, progress):
+        started.set()
+        try:
+            while True:
+                progress("tick")
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    runner = JobQueue(path, {"work": handler}, workers=1)
+    other = JobQueue(path, {"work": handler}, workers=0)
+    job_id = runner.submit("work", {})
+    runner.start()
+    assert started.wait(10)
+
+    assert other.cancel(job_id) == "cancelling"
+    assert stopped.wait(10)
+    _wait_for(lambda: runner.get(job_id)["status"] == "cancelled")
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("flask")
+
+import app as app_module
+from jobs import JobQueue
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    # A queue with no workers: jobs stay queued, nothing runs
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), handlers={"summary": lambda params, progress: None}, workers=0)
+    monkeypatch.setattr(app_module, "jobs", queue)
+    monkeypatch.setattr(app_module, "validate_supabase_token", lambda token: {"id": token} if token else None)
+    return app_module.app.test_client(), queue
+
+
+def _as(user):
+    return {"Authorization": f"Bearer {user}"}
+
+
+def test_job_routes_require_sign_in(client):
+    client, queue = client
+    job_id = queue.submit("summary", {"video_id": "v"}, user_id="alice")
+    assert client.get(f"/jobs/{job_id}").status_code == 401
+    assert client.get(f"/jobs/{job_id}/result").status_code == 401
+    assert client.delete(f"/jobs/{job_id}").status_code == 401
+    assert queue.get(job_id)["status"] == "queued"
+
+
+def test_only_the_owner_sees_or_cancels_a_job(client):
+    client, queue = client
+    job_id = queue.submit("summary", {"video_id": "v"}, user_id="alice")
+
+    assert client.get(f"/jobs/{job_id}", headers=_as("mallory")).status_code == 404
+    assert client.get(f"/jobs/{job_id}/result", headers=_as("mallory")).status_code == 404
+    assert client.delete(f"/jobs/{job_id}", headers=_as("mallory")).status_code == 404
+    assert queue.get(job_id)["status"] == "queued"
+
+    assert client.get(f"/jobs/{job_id}", headers=_as("alice")).get_json()["status"] == "queued"
+    assert client.get(f"/jobs/{job_id}/result", headers=_as("alice")).status_code == 202
+    assert client.delete(f"/jobs/{job_id}", headers=_as("alice")).get_json()["status"] == "cancelled"
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from llm_scheduler import BULK, INTERACTIVE, NORMAL, LLMScheduler, RateLimited, RateLimitExceeded
+
+
+def _scheduler(**kwargs):
+    settings = dict(requests_per_minute=10_000, tokens_per_minute=1_000_000, max_concurrency=8,
+                    max_retries=2, backoff_base=0.001, backoff_max=0.01)
+    settings.update(kwargs)
+    return LLMScheduler("test", **settings)
+
+
+def _rate_limited_then(result, failures, retry_after=None):
+    attempts = []
+
+    def fn():
+        attempts.append(time.monotonic())
+        if len(attempts) <= failures:
+            raise RateLimited("429", retry_after=retry_after)
+        return result
+
+    return fn, attempts
+
+
+def test_waiting_calls_are_admitted_by_priority():
+    scheduler = _scheduler(max_concurrency=1)
+    release = threading.Event()
+    blocker = threading.Thread(target=scheduler.call, args=(lambda: release.wait(5),))
+    blocker.start()
+    while scheduler.stats()["in_flight"] < 1:
+        time.sleep(0.005)
+
+    order = []
+    threads = []
+    for name, priority in (("bulk", BULK), ("normal", NORMAL), ("interactive", INTERACTIVE), ("bulk2", BULK)):
+        thread = threading.Thread(target=scheduler.call, args=(lambda name=name: order.append(name),),
+                                  kwargs={"priority": priority})
+        thread.start()
+        threads.append(thread)
+        while scheduler.stats()["queued"] < len(threads):
+            time.sleep(0.005)
+
+    release.set()
+    for thread in [blocker] + threads:
+        thread.join(5)
+    # By priority, first come first served within one
+    assert order == ["interactive", "normal", "bulk", "bulk2"]
+
+
+def test_limit_halves_on_429_and_grows_back():
+    scheduler = _scheduler(max_concurrency=8)
+    fn, attempts = _rate_limited_then("ok", failures=1)
+
+    assert scheduler.call(fn) == "ok"
+    assert len(attempts) == 2
+    assert scheduler.stats()["concurrency_limit"] == 4
+
+    # One more slot after a limit's worth of successes (the retry counted as one)
+    for _ in range(3):
+        scheduler.call(lambda: None)
+    assert scheduler.stats()["concurrency_limit"] == 5
+    for _ in range(5):
+        scheduler.call(lambda: None)
+    assert scheduler.stats()["concurrency_limit"] == 6
+
+
+def test_gives_up_after_max_retries():
+    scheduler = _scheduler(max_retries=2)
+    fn, attempts = _rate_limited_then("ok", failures=10)
+
+    with pytest.raises(RateLimitExceeded):
+        scheduler.call(fn)
+    assert len(attempts) == 3
+    stats = scheduler.stats()
+    assert stats["exhausted"] == 1
+    assert stats["rate_limited"] == 3
+    assert stats["in_flight"] == 0
+
+
+def test_final_429_does_not_pause_other_callers():
+    scheduler = _scheduler(max_retries=0)
+    fn, _ = _rate_limited_then("ok", failures=1, retry_after=30)
+
+    with pytest.raises(RateLimitExceeded) as raised:
+        scheduler.call(fn)
+    # The client is still told when to come back...
+    assert raised.value.retry_after >= 30
+    # ...but nobody is held up for a retry that won't happen
+    assert scheduler.stats()["paused_for_seconds"] == 0
+    started = time.monotonic()
+    assert scheduler.call(lambda: "ok") == "ok"
+    assert time.monotonic() - started < 1
+
+
+def test_other_errors_are_not_retried():
+    scheduler = _scheduler()
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise ValueError("bad payload")
+
+    with pytest.raises(ValueError):
+        scheduler.call(fn)
+    assert attempts == [1]
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_rate_limited_call_gets_its_tokens_back():
+    scheduler = _scheduler(tokens_per_minute=1000, max_retries=0)
+    fn, _ = _rate_limited_then("ok", failures=1)
+
+    with pytest.raises(RateLimitExceeded):
+        scheduler.call(fn, tokens=800)
+    # Without the refund the bucket would be 800 short for the next minute
+    started = time.monotonic()
+    assert scheduler.call(lambda: "ok", tokens=800) == "ok"
+    assert time.monotonic() - started < 1
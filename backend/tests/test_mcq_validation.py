@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from mcq_validation import extract_quiz_items, iter_json_objects
+
+
+def _mcq(n):
+    return {"question": f"Question {n}?", "options": ["a", "b", "c", "d"], "answer_index": n % 4,
+            "explanation": "because"}
+
+
+def _card(n):
+    return {"question": f"Term {n}", "answer": f"Definition {n}"}
+
+
+def test_whole_answer_parses_once():
+    raw = json.dumps({"mcqs": [_mcq(1), _mcq(2)], "flashcards": [_card(1)]})
+    assert list(iter_json_objects(raw)) == [json.loads(raw)]
+    assert extract_quiz_items(raw) == ([_mcq(1), _mcq(2)], [_card(1)])
+
+
+def test_prose_and_code_fences_around_the_json():
+    raw = "Sure! Here are your questions:\n```json\n" + json.dumps([_mcq(1), _mcq(2)]) + "\n```\nGood luck!"
+    assert extract_quiz_items(raw) == ([_mcq(1), _mcq(2)], [])
+
+
+def test_truncated_answer_keeps_its_complete_items():
+    whole = json.dumps({"mcqs": [_mcq(1), _mcq(2), _mcq(3)], "flashcards": [_card(1)]})
+    cut = whole[:whole.index('"Question 3')]  # cut off mid-object, as at max_tokens
+    mcqs, flashcards = extract_quiz_items(cut)
+    assert mcqs == [_mcq(1), _mcq(2)]
+    assert flashcards == []
+
+
+def test_broken_item_is_skipped_not_the_rest():
+    raw = "[" + json.dumps(_mcq(1)) + ', {"question": "Broken?", "options": [1, 2,, }, ' + json.dumps(_mcq(2)) + "]"
+    assert extract_quiz_items(raw)[0] == [_mcq(1), _mcq(2)]
+
+
+@pytest.mark.parametrize("raw", ["", "no json here", "{", "[1, 2, 3]"])
+def test_nothing_to_extract(raw):
+    assert extract_quiz_items(raw) == ([], [])
+
+
+def test_short_answer_is_topped_up_with_only_whats_missing():
+    pytest.importorskip("langchain")
+    from mcq_flashcard_generator import collect_quiz_items
+
+    asked = []
+    answers = [
+        json.dumps({"mcqs": [_mcq(1), _mcq(2)], "flashcards": [_card(1)]}),
+        # The top-up repeats a question; only new ones count
+        json.dumps({"mcqs": [_mcq(2), _mcq(3), _mcq(4)], "flashcards": [_card(2)]}),
+    ]
+
+    def ask(missing_questions, missing_flashcards):
+        asked.append((missing_questions, missing_flashcards))
+        return answers[len(asked) - 1]
+
+    mcqs, flashcards = collect_quiz_items(ask, num_questions=4, num_flashcards=2, retries=2)
+    assert asked == [(4, 2), (2, 1)]
+    assert [m["question"] for m in mcqs] == ["Question 1?", "Question 2?", "Question 3?", "Question 4?"]
+    assert len(flashcards) == 2
+
+
+def test_top_up_stops_after_retries():
+    pytest.importorskip("langchain")
+    from mcq_flashcard_generator import collect_quiz_items
+
+    asked = []
+
+    def ask(missing_questions, missing_flashcards):
+        asked.append(missing_questions)
+        return "Sorry, I can't help with that."
+
+    assert collect_quiz_items(ask, num_questions=3, retries=1) == ([], [])
+    assert asked == [3, 3]
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("numpy")
+
+import pipeline
+import vector_utils
+from fake_llm import FakeLLM
+
+
+@pytest.fixture
+def compact(monkeypatch, tmp_path):
+    """Compact vector store in a scratch directory, FakeLLM, transcripts from a dict."""
+    monkeypatch.setattr(vector_utils, "VECTOR_STORE", "compact")
+    monkeypatch.setattr(vector_utils, "COMPACT_STORE_DIR", str(tmp_path / "compact"))
+    llm = FakeLLM(latency=0)
+    monkeypatch.setattr(pipeline, "get_llm", lambda: llm)
+    transcripts = {}
+    monkeypatch.setattr(pipeline, "get_transcript", transcripts.__getitem__)
+    return transcripts, llm
+
+
+def test_blank_transcript_gets_an_empty_summary(compact):
+    transcripts, llm = compact
+    transcripts["music-only"] = [{"text": "  ", "start": 0.0, "duration": 180.0}]
+
+    result = pipeline.summarize_video("music-only", refresh=True)
+    assert result["summary"] == ""
+    assert result["chunks_created"] == 0
+    assert llm.calls == 0
+    assert vector_utils.load_video_index("music-only") is None
+
+
+def test_cached_summary_still_gets_its_rag_index(compact, monkeypatch, tmp_path):
+    from bench_data import synthetic_transcript
+    from bench_stages import HashEmbeddings
+
+    monkeypatch.setattr(vector_utils, "get_embeddings", HashEmbeddings)
+    transcripts, llm = compact
+    transcripts["lecture"] = [{"text": synthetic_transcript(3), "start": 0.0, "duration": 180.0}]
+
+    first = pipeline.summarize_video("lecture", refresh=True)
+    assert vector_utils.load_video_index("lecture") is not None
+    calls = llm.calls
+
+    # The index is gone (e.g. VECTOR_STORE changed) but the summary is cached
+    monkeypatch.setattr(vector_utils, "COMPACT_STORE_DIR", str(tmp_path / "other"))
+    assert vector_utils.load_video_index("lecture") is None
+    second = pipeline.summarize_video("lecture")
+
+    assert second["summary"] == first["summary"]
+    assert llm.calls == calls
+    assert vector_utils.load_video_index("lecture") is not None
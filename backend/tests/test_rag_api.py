@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("langchain_community")
+
+import app as app_module
+import rag
+import vector_utils
+
+
+def test_rag_on_a_video_never_ingested_is_404(monkeypatch, tmp_path):
+    monkeypatch.setattr(rag, "load_video_index", lambda video_id: vector_utils.load_video_index(
+        video_id, persist_directory=str(tmp_path / "chroma")))
+    fetched = []
+    monkeypatch.setattr(app_module.transcript_store, "get_transcript", fetched.append)
+
+    response = app_module.app.test_client().post("/rag", json={"video_id": "never-seen", "query": "what?"})
+    assert response.status_code == 404
+    # Nothing fetched, embedded or persisted for it
+    assert fetched == []
+    assert not (tmp_path / "chroma").exists()
+
+
+def test_rag_with_an_unknown_transcript_id_fetches_nothing(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(app_module.transcript_store, "_fetch_from_youtube", fetched.append)
+
+    response = app_module.app.test_client().post(
+        "/rag", json={"transcript_id": "anyVideoId.000000000000", "query": "what?"})
+    assert response.status_code == 400
+    assert fetched == []
@@ -0,0 +1,61 @@
+import pytest
+
+import result_cache
+from disk_cache import DiskCache
+
+TEMPLATES = ["Summarize:\n{text}"]
+LLM_PARAMS = {"model": "test-model", "temperature": 0.7, "max_tokens": 1024}
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path / "results.sqlite3"), max_bytes=1 << 20, ttl=3600)
+    monkeypatch.setattr(result_cache, "_cache", cache)
+    return cache
+
+
+class Compute:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"summary": f"run {self.calls}"}
+
+
+def test_repeat_requests_are_served_from_the_cache():
+    compute = Compute()
+    first = result_cache.cached_result("summary", "vid", compute, TEMPLATES, LLM_PARAMS)
+    again = result_cache.cached_result("summary", "vid", compute, TEMPLATES, LLM_PARAMS)
+    assert first == again == {"summary": "run 1"}
+    assert compute.calls == 1
+
+
+def test_refresh_recomputes_and_overwrites():
+    compute = Compute()
+    result_cache.cached_result("summary", "vid", compute, TEMPLATES, LLM_PARAMS)
+    assert result_cache.cached_result("summary", "vid", compute, TEMPLATES, LLM_PARAMS,
+                                      refresh=True) == {"summary": "run 2"}
+    assert result_cache.cached_result("summary", "vid", compute, TEMPLATES, LLM_PARAMS) == {"summary": "run 2"}
+    assert compute.calls == 2
+
+
+@pytest.mark.parametrize("change", [
+    {"kind": "mcqs"},
+    {"video_id": "other"},
+    {"templates": ["Summarize briefly:\n{text}"]},
+    {"llm_params": dict(LLM_PARAMS, temperature=0.2)},
+    {"settings": {"mode": "separate"}},
+])
+def test_a_change_in_any_input_is_a_miss(change):
+    args = {"kind": "summary", "video_id": "vid", "templates": TEMPLATES, "llm_params": LLM_PARAMS}
+    compute = Compute()
+    result_cache.cached_result(compute=compute, **args)
+    result_cache.cached_result(compute=compute, **dict(args, **change))
+    assert compute.calls == 2
+
+
+def test_prompt_hash_reads_prompt_templates_like_strings():
+    PromptTemplate = pytest.importorskip("langchain.prompts").PromptTemplate
+    template = PromptTemplate.from_template(TEMPLATES[0])
+    assert result_cache.prompt_hash(template) == result_cache.prompt_hash(TEMPLATES[0])
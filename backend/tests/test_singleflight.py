@@ -0,0 +1,65 @@
+import threading
+
+from singleflight import SingleFlight
+
+
+class LeaderOnly(Exception):
+    pass
+
+
+def _leader_and_follower(flight, leader_fn, follower_fn):
+    """Run a follower into `leader_fn`'s flight; returns (leader outcome, follower outcome)."""
+    started, release = threading.Event(), threading.Event()
+    outcomes = {}
+
+    def leader_body():
+        started.set()
+        release.wait(5)
+        return leader_fn()
+
+    def call(name, fn):
+        try:
+            outcomes[name] = flight.do("key", fn, timeout=5)
+        except Exception as e:
+            outcomes[name] = e
+
+    leader = threading.Thread(target=call, args=("leader", leader_body))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call, args=("follower", follower_fn))
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    return outcomes["leader"], outcomes["follower"]
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight("test")
+    leader, follower = _leader_and_follower(flight, lambda: "shared", lambda: "own")
+    assert (leader, follower) == ("shared", "shared")
+
+
+def test_followers_rerun_after_a_leader_only_failure():
+    flight = SingleFlight("test", retry_on=(LeaderOnly,))
+
+    def refused():
+        raise LeaderOnly("leader over quota")
+
+    leader, follower = _leader_and_follower(flight, refused, lambda: "own")
+    assert isinstance(leader, LeaderOnly)
+    assert follower == "own"
+    assert flight.stats()["retried"] == 1
+
+
+def test_other_failures_reach_followers():
+    flight = SingleFlight("test", retry_on=(LeaderOnly,))
+
+    def broken():
+        raise ValueError("transcript unavailable")
+
+    leader, follower = _leader_and_follower(flight, broken, lambda: "own")
+    assert isinstance(leader, ValueError)
+    assert follower is leader
@@ -0,0 +1,104 @@
+import random
+import threading
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from chunking import count_tokens
+from digests import video_digests
+from fake_llm import FakeLLM
+from summarizer import reduce_groups, summarize_notes
+
+
+def _finishes(fn, timeout=10):
+    """fn()'s result, failing the test instead of hanging if it doesn't return."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert result, f"did not return within {timeout}s"
+    return result[0]
+
+
+def test_summarize_notes_without_notes_is_empty():
+    llm = FakeLLM(latency=0)
+    assert _finishes(lambda: summarize_notes(llm, [])) == ""
+    assert llm.calls == 0
+
+
+@pytest.mark.parametrize("transcript", ["", "   \n  "])
+def test_blank_transcript_has_no_digests(transcript):
+    llm = FakeLLM(latency=0)
+    assert video_digests(llm, "blank-video", transcript, 1.0) == []
+    assert llm.calls == 0
+
+
+def _summaries(count, seed=0, max_words=120):
+    rng = random.Random(seed)
+    return [" ".join(f"word{rng.randint(0, 999)}" for _ in range(rng.randint(1, max_words)))
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize("count", range(1, 40))
+@pytest.mark.parametrize("fan_in", [2, 3, 6])
+def test_reduce_groups_respects_fan_in_and_budget(count, fan_in):
+    summaries = _summaries(count, seed=count * fan_in)
+    budget = 2 * max(count_tokens(s) for s in summaries) + 50
+    groups = reduce_groups(summaries, budget, fan_in=fan_in)
+
+    assert [s for group in groups for s in group] == summaries
+    for group in groups:
+        assert 1 <= len(group) <= fan_in
+        assert sum(count_tokens(s) for s in group) <= budget
+
+
+def test_reduce_groups_rebalances_a_lone_leftover():
+    # 7 summaries at fan-in 6: not one group of 7, and no group of one
+    groups = reduce_groups(["a b c"] * 7, budget=10_000, fan_in=6)
+    assert [len(group) for group in groups] == [5, 2]
+
+
+def test_tree_reduce_merges_many_notes_into_one_summary():
+    llm = FakeLLM(latency=0)
+    summary = _finishes(lambda: summarize_notes(llm, _summaries(29, max_words=400)))
+    assert summary.strip()
+    assert llm.calls >= 2
+
+
+def test_cancelling_mid_map_stops_llm_calls():
+    from config import SUMMARY_MAX_WORKERS
+    from digests import build_digests
+    from jobs import JobCancelled
+    from mcq_flashcard_generator import chunk_transcript_for_mcq
+
+    transcript = " ".join(_summaries(1500, max_words=120))
+    chunks = len(chunk_transcript_for_mcq(transcript, 60.0))
+    llm = FakeLLM(latency=0.01)
+    digested, calls_at_cancel = [], []
+
+    def progress(event, **data):
+        digested.append(data["index"])
+        if len(digested) == 2:
+            calls_at_cancel.append(llm.calls)
+            raise JobCancelled("job")
+
+    with pytest.raises(JobCancelled):
+        build_digests(llm, transcript, 60.0, progress=progress)
+    threading.Event().wait(0.5)
+    # Only calls already in flight finish: no new chunks start and nothing is retried
+    assert llm.calls <= calls_at_cancel[0] + SUMMARY_MAX_WORKERS
+    assert llm.calls < chunks
+
+
+def test_transcript_that_fits_one_prompt_is_not_digested():
+    from pipeline import _prompt_chunks
+
+    llm = FakeLLM(latency=0)
+    short = " ".join(_summaries(5))
+    assert _prompt_chunks(llm, "short-video", short, 2.0, False, None) is None
+    assert llm.calls == 0
+
+    long = " ".join(_summaries(400))
+    assert len(_prompt_chunks(llm, "long-video", long, 60.0, False, None)) > 1
+    assert llm.calls > 1
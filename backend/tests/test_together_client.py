@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import http_clients
+import llm_scheduler
+import usage
+from summarizer import LLM_PARAMS
+from together_client import PooledTogether
+
+
+class _Response:
+    status_code = 200
+    headers = {}
+    text = ""
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def _completion(text, prompt_tokens, completion_tokens):
+    choices = [{"text": text}]
+    # Older and newer langchain_community read the text from different places
+    return {
+        "output": {"choices": choices},
+        "choices": choices,
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+    }
+
+
+def _completion_response():
+    return _Response(_completion("hello", prompt_tokens=12, completion_tokens=3))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = usage.UsageStore(
+        str(tmp_path / "usage.sqlite3"),
+        limits={"llm_tokens": 0, "llm_requests": 0, "transcript_minutes": 0},
+    )
+    monkeypatch.setattr(usage, "store", store)
+    return store
+
+
+def test_call_records_tokens_for_current_user(store, monkeypatch):
+    monkeypatch.setattr(http_clients.together, "post", lambda url, **kwargs: _completion_response())
+    llm = PooledTogether(**LLM_PARAMS)
+
+    with usage.as_user("user-1"):
+        assert llm.invoke("Say hello") == "hello"
+        llm.invoke("Say hello again")
+
+    assert store.usage("user-1") == {"llm_tokens": 30, "llm_requests": 2, "transcript_minutes": 0}
+
+
+def test_call_without_user_records_nothing(store, monkeypatch):
+    monkeypatch.setattr(http_clients.together, "post", lambda url, **kwargs: _completion_response())
+
+    assert PooledTogether(**LLM_PARAMS).invoke("Say hello") == "hello"
+    assert store.stats()["llm_requests"] == 0
+
+
+class _StreamResponse:
+    status_code = 200
+    headers = {}
+    text = ""
+
+    def __init__(self, texts, usage=None):
+        self.sent = []
+        self.closed = False
+        self._texts = texts
+        self._usage = usage
+
+    def iter_lines(self, decode_unicode=False):
+        for i, text in enumerate(self._texts):
+            self.sent.append(text)
+            event = {"choices": [{"text": text}]}
+            if i == len(self._texts) - 1 and self._usage:
+                event["usage"] = self._usage
+            yield f"data: {json.dumps(event)}"
+            yield ""
+        yield "data: [DONE]"
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_yields_tokens_as_they_arrive(store, monkeypatch):
+    response = _StreamResponse(["Hel", "lo", " there"], usage={"prompt_tokens": 12, "completion_tokens": 3})
+    requests = []
+
+    def post(url, **kwargs):
+        requests.append(kwargs)
+        return response
+
+    monkeypatch.setattr(http_clients.together, "post", post)
+    llm = PooledTogether(**LLM_PARAMS)
+
+    received = []
+    with usage.as_user("user-1"):
+        for token in llm.stream("Say hello"):
+            # Each token is handed on before the next one is read from the connection
+            assert len(response.sent) == len(received) + 1
+            received.append(token)
+
+    assert received == ["Hel", "lo", " there"]
+    assert requests[0]["stream"] is True and requests[0]["json"]["stream"] is True
+    assert response.closed
+    assert store.usage("user-1") == {"llm_tokens": 15, "llm_requests": 1, "transcript_minutes": 0}
+    assert llm_scheduler.together.stats()["in_flight"] == 0
+
+
+def test_abandoned_stream_frees_its_slot(store, monkeypatch):
+    response = _StreamResponse(["a", "b", "c", "d"])
+    monkeypatch.setattr(http_clients.together, "post", lambda url, **kwargs: response)
+
+    stream = PooledTogether(**LLM_PARAMS).stream("Say hello")
+    assert next(stream) == "a"
+    stream.close()
+
+    assert response.closed
+    assert llm_scheduler.together.stats()["in_flight"] == 0
+
+
+def test_async_call_goes_through_the_pool_and_records_usage(store, monkeypatch):
+    import asyncio
+
+    posts = []
+
+    def post(url, **kwargs):
+        posts.append(url)
+        return _completion_response()
+
+    monkeypatch.setattr(http_clients.together, "post", post)
+    llm = PooledTogether(**LLM_PARAMS)
+
+    with usage.as_user("user-1"):
+        assert asyncio.run(llm.ainvoke("Say hello")) == "hello"
+
+    assert len(posts) == 1
+    assert store.usage("user-1") == {"llm_tokens": 15, "llm_requests": 1, "transcript_minutes": 0}
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("youtube_transcript_api")
+
+import transcript_store
+
+SEGMENTS = [{"text": "hello there", "start": 0.0, "duration": 2.0}]
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    fetched = []
+
+    def fetch(video_id):
+        fetched.append(video_id)
+        return SEGMENTS
+
+    monkeypatch.setattr(transcript_store, "_fetch_from_youtube", fetch)
+    return fetched
+
+
+def test_resolves_the_id_of_a_stored_transcript(fetches):
+    transcript_store._store.set("stored-video", SEGMENTS)
+    tid = transcript_store.transcript_id("stored-video", transcript_store.transcript_text(SEGMENTS))
+
+    assert transcript_store.resolve_transcript_id(tid) == "stored-video"
+    assert transcript_store.resolve_transcript_id("stored-video.000000000000") is None
+    assert fetches == []
+
+
+def test_unknown_id_is_not_fetched(fetches):
+    assert transcript_store.resolve_transcript_id("never-fetched.000000000000") is None
+    assert fetches == []
+    assert transcript_store._store.get("never-fetched") is None
@@ -0,0 +1,50 @@
+import pytest
+
+import usage
+
+
+@pytest.fixture
+def store(tmp_path):
+    return usage.UsageStore(
+        str(tmp_path / "usage.sqlite3"),
+        limits={"llm_tokens": 1000, "llm_requests": 10, "transcript_minutes": 60},
+        max_active_runs=1,
+    )
+
+
+def test_check_refuses_users_over_quota(store):
+    store.record("user-1", llm_tokens=1000)
+    with usage.as_user("user-1"), pytest.raises(usage.QuotaExceeded):
+        store.check()
+    with usage.as_user("user-2"):
+        store.check()
+
+
+def test_check_refuses_requests_without_a_free_run_slot(store):
+    with usage.as_user("user-1"), store.run(transcript_minutes=10):
+        with pytest.raises(usage.QuotaExceeded):
+            store.check()
+    with usage.as_user("user-1"):
+        store.check()
+
+
+def test_check_lets_background_jobs_wait_for_a_slot(store):
+    with usage.as_user("user-1", wait_for_slot=True), store.run(transcript_minutes=10):
+        store.check()
+
+
+def test_run_charges_minutes_and_refuses_videos_that_dont_fit(store):
+    with usage.as_user("user-1"):
+        with store.run(transcript_minutes=45):
+            pass
+        with pytest.raises(usage.QuotaExceeded):
+            with store.run(transcript_minutes=20):
+                pass
+    assert store.usage("user-1")["transcript_minutes"] == 45
+
+
+def test_no_user_is_neither_limited_nor_recorded(store):
+    store.check()
+    with store.run(transcript_minutes=500):
+        store.record(llm_tokens=5000)
+    assert store.stats()["users"] == 0
@@ -0,0 +1,145 @@
+import json
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_community.llms.together import Together
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+import http_clients
+import llm_scheduler
+import metrics
+import usage
+from chunking import count_tokens
+
+
+class PooledTogether(Together):
+    """
+    LangChain's Together LLM, but every completion goes through the shared
+    keep-alive session in http_clients instead of a fresh connection, is
+    admitted by the global llm_scheduler (rate limits, 429 backoff,
+    priorities) and is recorded in the LLM metrics (latency, tokens, cost)
+    and in the usage of the user it runs for. `llm.stream()` streams the
+    completion from Together as it is generated. The async methods
+    (`ainvoke`, `astream`) run the same code on an executor thread.
+    """
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        headers, payload = self._request(prompt, stop, kwargs)
+        # Reserve prompt + the most the completion can use; refund the rest after
+        reserved = count_tokens(prompt) + (self.max_tokens or 0)
+        data, seconds = llm_scheduler.together.call(lambda: self._complete(headers, payload), tokens=reserved)
+        text = self._format_output(data)
+        self._record(prompt, text, data.get("usage"), reserved, seconds)
+        return text
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        # Together's own _acall posts with aiohttp, past the pooled session, the
+        # scheduler and usage accounting: run _call on an executor thread instead
+        # (LangChain's default, which carries the contextvars across)
+        return await LLM._acall(self, prompt, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[GenerationChunk]:
+        headers, payload = self._request(prompt, stop, kwargs)
+        payload["stream"] = True
+        reserved = count_tokens(prompt) + (self.max_tokens or 0)
+        started = time.perf_counter()
+        parts, reported_usage = [], {}
+        events = llm_scheduler.together.stream(lambda: self._open_stream(headers, payload), tokens=reserved)
+        try:
+            for event in events:
+                # The last event carries the usage of the whole completion
+                reported_usage = event.get("usage") or reported_usage
+                choices = event.get("choices") or [{}]
+                text = choices[0].get("text") or ""
+                if not text:
+                    continue
+                parts.append(text)
+                chunk = GenerationChunk(text=text)
+                if run_manager:
+                    run_manager.on_llm_new_token(text, chunk=chunk)
+                yield chunk
+        finally:
+            # Frees the scheduler slot and the connection right away if the caller stops early
+            events.close()
+            # Also for a stream that broke off or was abandoned: what was generated is spent
+            if parts or reported_usage:
+                self._record(prompt, "".join(parts), reported_usage, reserved, time.perf_counter() - started)
+
+    def _request(self, prompt, stop, kwargs):
+        headers = {
+            "Authorization": f"Bearer {self.together_api_key.get_secret_value()}",
+            "Content-Type": "application/json",
+        }
+        stop_to_use = stop[0] if stop and len(stop) == 1 else stop
+        payload = {**self.default_params, "prompt": prompt, "stop": stop_to_use, **kwargs}
+        # filter None values to not pass them to the http payload
+        payload = {k: v for k, v in payload.items() if v is not None}
+        return headers, payload
+
+    def _record(self, prompt, text, reported_usage, reserved, seconds):
+        # Together reports exact usage; estimate if a response lacks it
+        reported_usage = reported_usage or {}
+        prompt_tokens = reported_usage.get("prompt_tokens") or count_tokens(prompt)
+        completion_tokens = reported_usage.get("completion_tokens") or count_tokens(text)
+        llm_scheduler.together.refund(reserved - prompt_tokens - completion_tokens)
+        metrics.record_llm_call(self.model, seconds, prompt_tokens, completion_tokens)
+        usage.store.record(llm_tokens=prompt_tokens + completion_tokens, llm_requests=1)
+
+    def _complete(self, headers, payload):
+        response, seconds = self._post(headers, payload)
+        return response.json(), seconds
+
+    def _open_stream(self, headers, payload):
+        """Send the streaming request; the Server-Sent Events of the answer, parsed, as they arrive."""
+        response, _ = self._post(headers, payload, stream=True)
+
+        def events():
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    yield json.loads(data)
+            finally:
+                response.close()
+
+        return events()
+
+    def _post(self, headers, payload, stream=False):
+        started = time.perf_counter()
+        try:
+            response = http_clients.together.post(self.base_url, headers=headers, json=payload, stream=stream)
+        except Exception:
+            metrics.record_llm_call(self.model, time.perf_counter() - started, 0, 0, outcome="error")
+            raise
+        # For a stream: until the headers arrived
+        seconds = time.perf_counter() - started
+        if response.status_code != 200:
+            metrics.record_llm_call(self.model, seconds, 0, 0, outcome=str(response.status_code))
+        if response.status_code == 429:
+            # The scheduler backs off, lowers concurrency and retries
+            raise llm_scheduler.RateLimited(
+                f"Together rate limit: {response.text[:200]}",
+                retry_after=_retry_after(response.headers.get("Retry-After")),
+            )
+        if response.status_code >= 500:
+            raise Exception(f"Together Server: Error {response.status_code}")
+        elif response.status_code >= 400:
+            raise ValueError(f"Together received an invalid payload: {response.text}")
+        elif response.status_code != 200:
+            raise Exception(
+                f"Together returned an unexpected response with status "
+                f"{response.status_code}: {response.text}"
+            )
+        return response, seconds
+
+
+def _retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+
+from youtube_transcript_api import YouTubeTranscriptApi
+
+import http_clients
+import metrics
+from config import CACHE_DIR, TRANSCRIPT_CACHE_MAX_BYTES
+from disk_cache import DiskCache
+from singleflight import SingleFlight
+
+# One store for every endpoint, so a video's transcript is fetched from
+# YouTube once and then served from disk (also across restarts).
+_store = DiskCache(
+    os.path.join(CACHE_DIR, "transcripts.sqlite3"),
+    max_bytes=TRANSCRIPT_CACHE_MAX_BYTES,
+)
+# Summary and quiz requests for a new video usually arrive together
+_fetches = SingleFlight("transcript fetch")
+
+log = logging.getLogger(__name__)
+
+
+def get_transcript(video_id):
+    """Return the raw transcript segments for `video_id`, fetching them only on a cache miss."""
+    segments = _store.get(video_id)
+    if segments is None:
+        segments = _fetches.do(video_id, lambda: _fetch(video_id))
+    return segments
+
+
+def _fetch_from_youtube(video_id):
+    # Go through the pooled YouTube session instead of a new one per fetch
+    session = http_clients.youtube.session
+    try:
+        api = YouTubeTranscriptApi(http_client=session)  # youtube-transcript-api >= 1.0
+    except TypeError:
+        api = None
+    if api is not None and hasattr(api, "fetch"):
+        return api.fetch(video_id).to_raw_data()
+    # 0.6.x: same as get_transcript(video_id), minus the throwaway requests.Session()
+    from youtube_transcript_api._transcripts import TranscriptListFetcher
+    return TranscriptListFetcher(session).fetch(video_id).find_transcript(("en",)).fetch()
+
+
+def _fetch(video_id):
+    with metrics.stage("transcript_fetch"):
+        segments = _fetch_from_youtube(video_id)
+    log.info("transcript fetched from YouTube", extra={"video_id": video_id, "segments": len(segments)})
+    _store.set(video_id, segments)
+    return segments
+
+
+def transcript_text(segments):
+    """Merge transcript segments into one long string."""
+    return " ".join(entry["text"] for entry in segments if "text" in entry)
+
+
+def transcript_duration_minutes(segments, default=30):
+    """
+    Video length derived from the segments we already have:
+    the last timestamp + its duration.
+    """
+    if not segments:
+        return default
+    last_entry = segments[-1]
+    duration_seconds = last_entry.get('start', 0) + last_entry.get('duration', 0)
+    return duration_seconds / 60
+
+
+def transcript_id(video_id, text):
+    """
+    Handle for the transcript the server holds for `video_id`, returned to
+    clients instead of the text itself (which can be hundreds of KB).
+    """
+    return f"{video_id}.{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+
+
+def resolve_transcript_id(tid):
+    """
+    The video_id behind a transcript_id, or None if it doesn't match the
+    transcript we hold. Only looks in the store: ids come from clients
+    (also on the anonymous /rag), so resolving one never fetches a video.
+    """
+    video_id, sep, _ = (tid or "").rpartition(".")
+    if not sep or not video_id:
+        return None
+    segments = _store.get(video_id)
+    if segments is None:
+        return None
+    if transcript_id(video_id, transcript_text(segments)) != tid:
+        return None
+    return video_id
+
+
+def cache_stats():
+    return dict(_store.stats(), fetches=_fetches.stats())
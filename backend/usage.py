@@ -0,0 +1,257 @@
+import contextlib
+import contextvars
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import (
+    CACHE_DIR,
+    USAGE_PERIOD,
+    USAGE_MAX_LLM_TOKENS,
+    USAGE_MAX_LLM_REQUESTS,
+    USAGE_MAX_TRANSCRIPT_MINUTES,
+    USAGE_MAX_ACTIVE_RUNS,
+)
+
+log = logging.getLogger(__name__)
+
+# Who the work in this context is billed to, and whether it may wait for a
+# free run slot (background jobs) or is shed when there is none (requests).
+# run_concurrently and the SSE worker copy contextvars, so LLM calls made on
+# worker threads are billed to the same user.
+_user = contextvars.ContextVar("usage_user", default=None)
+_wait_for_slot = contextvars.ContextVar("usage_wait_for_slot", default=False)
+
+
+@contextlib.contextmanager
+def as_user(user_id, wait_for_slot=False):
+    """Bill the LLM calls and pipeline runs in this block to `user_id` (None: nobody)."""
+    user_token = _user.set(user_id)
+    wait_token = _wait_for_slot.set(wait_for_slot)
+    try:
+        yield
+    finally:
+        _wait_for_slot.reset(wait_token)
+        _user.reset(user_token)
+
+
+def current_user():
+    return _user.get()
+
+
+class QuotaExceeded(Exception):
+    """The user is over a quota or has too much work in flight; surfaced to the client as 429."""
+
+    def __init__(self, message, reset_time=None):
+        super().__init__(message)
+        self.reset_time = reset_time
+
+
+def period_bounds(period, now=None):
+    """(key, start, end) of the UTC day or month containing `now`."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    if period == "month":
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start.strftime("%Y-%m"), start, end
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.strftime("%Y-%m-%d"), start, start + datetime.timedelta(days=1)
+
+
+def _iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class UsageStore:
+    """
+    Per-user, per-period counters of LLM tokens, LLM requests and processed
+    transcript minutes in a local SQLite file, plus admission control:
+
+    - `admit()` refuses work (QuotaExceeded) once any counter has reached
+      its quota for the current period.
+    - `run()` wraps an expensive (uncached) pipeline run: it admits it,
+      charges its transcript minutes and holds one of the user's
+      `max_active_runs` slots while it runs. With no slot free, requests
+      are refused and background jobs wait for one.
+
+    Work without a user (None) is neither recorded nor limited.
+    """
+
+    def __init__(self, path, limits, period="day", max_active_runs=2):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.limits = limits
+        self.period = period
+        self.max_active_runs = max_active_runs
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._active = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                user_id TEXT NOT NULL,
+                period TEXT NOT NULL,
+                llm_tokens INTEGER NOT NULL DEFAULT 0,
+                llm_requests INTEGER NOT NULL DEFAULT 0,
+                transcript_minutes REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, period)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def record(self, user_id=None, llm_tokens=0, llm_requests=0, transcript_minutes=0.0):
+        """Add to the user's counters for the current period (default user: the context's)."""
+        user_id = user_id or _user.get()
+        if user_id is None:
+            return
+        key, _, _ = period_bounds(self.period)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO usage (user_id, period, llm_tokens, llm_requests, transcript_minutes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, period) DO UPDATE SET "
+                "llm_tokens = llm_tokens + excluded.llm_tokens, "
+                "llm_requests = llm_requests + excluded.llm_requests, "
+                "transcript_minutes = transcript_minutes + excluded.transcript_minutes, "
+                "updated_at = excluded.updated_at",
+                (user_id, key, int(llm_tokens), int(llm_requests), float(transcript_minutes), time.time()),
+            )
+            self._conn.commit()
+
+    def usage(self, user_id):
+        """The user's counters for the current period."""
+        key, _, _ = period_bounds(self.period)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT llm_tokens, llm_requests, transcript_minutes FROM usage WHERE user_id = ? AND period = ?",
+                (user_id, key),
+            ).fetchone()
+        llm_tokens, llm_requests, transcript_minutes = row or (0, 0, 0.0)
+        return {
+            "llm_tokens": llm_tokens,
+            "llm_requests": llm_requests,
+            "transcript_minutes": round(transcript_minutes, 2),
+        }
+
+    def report(self, user_id):
+        """Usage, quotas and remaining allowance for /check-usage."""
+        used = self.usage(user_id)
+        _, start, end = period_bounds(self.period)
+        shares = [used[name] / limit for name, limit in self.limits.items() if limit]
+        remaining = {name: max(0, limit - used[name]) if limit else None for name, limit in self.limits.items()}
+        with self._lock:
+            active = self._active.get(user_id, 0)
+        return {
+            "period": self.period,
+            "period_start": _iso(start),
+            "reset_time": _iso(end),
+            "usage": used,
+            "limits": dict(self.limits),
+            "remaining": remaining,
+            "usage_percentage": round(100 * max(shares, default=0.0), 1),
+            "requests_remaining": remaining.get("llm_requests"),
+            "active_runs": active,
+            "max_active_runs": self.max_active_runs,
+        }
+
+    def admit(self, user_id=None, transcript_minutes=0.0):
+        """Raise QuotaExceeded if the user may not start work on `transcript_minutes` more of video."""
+        user_id = user_id or _user.get()
+        if user_id is None:
+            return
+        used = self.usage(user_id)
+        planned = dict(used, transcript_minutes=used["transcript_minutes"] + transcript_minutes)
+        for name, limit in self.limits.items():
+            # Minutes are known up front, so a video that doesn't fit is refused
+            # outright; tokens/requests are only known after the fact
+            over = planned[name] > limit if name == "transcript_minutes" else used[name] >= limit
+            if limit and over:
+                _, _, end = period_bounds(self.period)
+                log.info("usage quota exceeded", extra={"user_id": user_id, "quota": name, "limit": limit})
+                raise QuotaExceeded(
+                    f"Usage quota exceeded: {name.replace('_', ' ')} ({limit:g} per {self.period})",
+                    reset_time=_iso(end),
+                )
+
+    def check(self, user_id=None):
+        """
+        Raise QuotaExceeded if the user (default: the context's) is over a
+        quota, or may not wait for a run slot and has none free. Called per
+        caller before joining a coalesced run, whose leader alone goes
+        through run().
+        """
+        user_id = user_id or _user.get()
+        if user_id is None:
+            return
+        self.admit(user_id)
+        if not _wait_for_slot.get():
+            with self._lock:
+                busy = self.max_active_runs and self._active.get(user_id, 0) >= self.max_active_runs
+            if busy:
+                raise self._too_many_runs()
+
+    def _too_many_runs(self):
+        return QuotaExceeded(
+            f"Too many videos processing at once (at most {self.max_active_runs}); "
+            f"try again when one finishes")
+
+    @contextlib.contextmanager
+    def run(self, transcript_minutes=0.0):
+        """Admit an expensive run for the context's user, charge its minutes and hold a run slot."""
+        user_id = _user.get()
+        if user_id is None:
+            yield
+            return
+        self.admit(user_id, transcript_minutes)
+        with self._lock:
+            while self.max_active_runs and self._active.get(user_id, 0) >= self.max_active_runs:
+                if not _wait_for_slot.get():
+                    raise self._too_many_runs()
+                self._slot_freed.wait()
+            self._active[user_id] = self._active.get(user_id, 0) + 1
+        try:
+            self.record(user_id, transcript_minutes=transcript_minutes)
+            yield
+        finally:
+            with self._lock:
+                self._active[user_id] -= 1
+                if not self._active[user_id]:
+                    del self._active[user_id]
+                self._slot_freed.notify_all()
+
+    def stats(self):
+        key, _, _ = period_bounds(self.period)
+        with self._lock:
+            users, llm_tokens, llm_requests, minutes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(llm_tokens), 0), COALESCE(SUM(llm_requests), 0), "
+                "COALESCE(SUM(transcript_minutes), 0) FROM usage WHERE period = ?",
+                (key,),
+            ).fetchone()
+            active = sum(self._active.values())
+        return {
+            "period": key,
+            "users": users,
+            "llm_tokens": llm_tokens,
+            "llm_requests": llm_requests,
+            "transcript_minutes": round(minutes, 2),
+            "active_runs": active,
+        }
+
+
+store = UsageStore(
+    os.path.join(CACHE_DIR, "usage.sqlite3"),
+    limits={
+        "llm_tokens": USAGE_MAX_LLM_TOKENS,
+        "llm_requests": USAGE_MAX_LLM_REQUESTS,
+        "transcript_minutes": USAGE_MAX_TRANSCRIPT_MINUTES,
+    },
+    period=USAGE_PERIOD,
+    max_active_runs=USAGE_MAX_ACTIVE_RUNS,
+)
@@ -1,46 +1,52 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.docstore.document import Document
-import math
 
-embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+import logging
+import os
+import re
 
-def calculate_dynamic_chunks(video_duration_minutes):
-    """
-    Calculate number of chunks as:
-    number_of_chunks = 2 * number_of_hours (rounded up)
-    """
-    hours = video_duration_minutes / 60
-    return max(1, math.ceil(hours * 2))  # Ensure at least 1 chunk
-def force_exact_chunks(text, num_chunks):
-    """
-    Manually split the text into exactly `num_chunks` parts
-    """
-    text_length = len(text)
-    avg_chunk_size = math.ceil(text_length / num_chunks)
-
-    chunks = []
-    for i in range(num_chunks):
-        start = i * avg_chunk_size
-        end = start + avg_chunk_size
-        chunk_text = text[start:end].strip()
-        if chunk_text:
-            chunks.append(Document(page_content=chunk_text))
-    
-    print(f"✅ Manually created {len(chunks)} chunks (target was {num_chunks})")
-    return chunks
+import metrics
+from chunking import chunk_text, token_budget, EMBEDDING_MAX_TOKENS
+from config import VECTOR_STORE, COMPACT_STORE_DIR, COMPACT_STORE_DTYPE
+from embeddings import get_embeddings
+from resources import lazy_resource
+from singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+CHROMA_DIR = "chroma_db"
+
+
+def _load_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_DIR)
+
+
+# One Chroma client per process, opened on first use
+chroma_client = lazy_resource("chroma_client", _load_chroma_client)
 
 
+def _chroma_kwargs(persist_directory):
+    # The default store goes through the shared client; other directories open their own
+    if persist_directory == CHROMA_DIR:
+        return {"client": chroma_client.get(), "persist_directory": persist_directory}
+    return {"persist_directory": persist_directory}
+
+# /transcript and /rag may both ingest a new video at the same time
+_ingests = SingleFlight("vector index build")
+
 def split_transcript_text_dynamic(text, video_duration_minutes):
     """
-    Split transcript based on video duration using exact chunk count
+    Split transcript into sentence-aware chunks that fit the embedding model
+    (all-MiniLM-L6-v2 silently truncates anything longer).
     """
-    target_chunks = calculate_dynamic_chunks(video_duration_minutes)
-    
-    print(f"📊 Video: {video_duration_minutes:.2f} min → {target_chunks} chunks (forced)")
-    
-    documents = force_exact_chunks(text, target_chunks)
+    with metrics.stage("chunking"):
+        documents = [
+            Document(page_content=chunk)
+            for chunk in chunk_text(text, token_budget(context_tokens=EMBEDDING_MAX_TOKENS))
+        ]
+    log.info("transcript chunked for embedding",
+             extra={"minutes": round(video_duration_minutes, 2), "chunks": len(documents)})
     return documents
     
 
@@ -53,11 +59,119 @@ def split_transcript_text(text, chunk_size=1000, chunk_overlap=100):
     )
     return splitter.create_documents([text])
 
-def store_chunks_in_chroma(documents, persist_directory="chroma_db"):
+def video_collection_name(video_id):
+    """One Chroma collection per video, so its chunks can be found (and reused) later."""
+    return f"video_{_safe_video_id(video_id)}_chunks"
+
+
+def _safe_video_id(video_id):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', video_id)
+
+
+class CompactVideoIndex:
+    """
+    A video's CompactVectorStore behind the one vectorstore method /rag
+    uses, similarity_search(), so it is interchangeable with Chroma.
+    """
+
+    def __init__(self, store, video_id):
+        self.store = store
+        self.video_id = video_id
+
+    def similarity_search(self, query, k=4):
+        hits = self.store.search(get_embeddings().embed_query(query), k=k)
+        return [
+            Document(page_content=self.store.text(row),
+                     metadata={"video_id": self.video_id, "chunk": row, "score": score})
+            for score, row in hits
+        ]
+
+
+def _compact_path(video_id):
+    return os.path.join(COMPACT_STORE_DIR, _safe_video_id(video_id))
+
+
+def load_video_index(video_id, persist_directory=CHROMA_DIR):
+    """The video's persisted index (VECTOR_STORE backend), or None if it hasn't been ingested yet. Read-only."""
+    if VECTOR_STORE == "compact":
+        from compact_store import CompactVectorStore
+        path = _compact_path(video_id)
+        return CompactVideoIndex(CompactVectorStore(path), video_id) if CompactVectorStore.exists(path) else None
+
+    if not _has_chroma_collection(video_id, persist_directory):
+        return None
+    from langchain_community.vectorstores import Chroma
+    return Chroma(
+        collection_name=video_collection_name(video_id),
+        embedding_function=get_embeddings(),
+        **_chroma_kwargs(persist_directory)
+    )
+
+
+def _has_chroma_collection(video_id, persist_directory):
+    # Looked up without creating anything: opening it through Chroma() would
+    # create an empty collection (and the directory) for any id asked about
+    if not os.path.isdir(persist_directory):
+        return False
+    if persist_directory == CHROMA_DIR:
+        client = chroma_client.get()
+    else:
+        import chromadb
+        client = chromadb.PersistentClient(path=persist_directory)
+    try:
+        collection = client.get_collection(video_collection_name(video_id))
+    except Exception:
+        # Missing: ValueError or NotFoundError, depending on the chromadb version
+        return False
+    return collection.count() > 0
+
+
+def store_chunks_in_chroma(documents, video_id=None, persist_directory=CHROMA_DIR):
+    """
+    Embed and persist transcript chunks. With a `video_id` they go into that
+    video's own index (a Chroma collection, or compact files with
+    VECTOR_STORE=compact), which is built once: later calls reuse it.
+    """
+    if video_id is None:
+        from langchain_community.vectorstores import Chroma
+        vectordb = Chroma.from_documents(
+            documents=documents,
+            embedding=get_embeddings(),
+            **_chroma_kwargs(persist_directory)
+        )
+        vectordb.persist()
+        return vectordb
+    return _ingests.do(video_id, lambda: _store_video_chunks(documents, video_id, persist_directory))
+
+
+def _store_video_chunks(documents, video_id, persist_directory):
+    existing = load_video_index(video_id, persist_directory)
+    if existing is not None:
+        log.info("reusing vector index", extra={"video_id": video_id})
+        return existing
+    # Includes embedding the chunks (also timed on its own as "embedding")
+    with metrics.stage("vector_store_write"):
+        return _build_video_index(documents, video_id, persist_directory)
+
+
+def _build_video_index(documents, video_id, persist_directory):
+    for i, doc in enumerate(documents):
+        doc.metadata.update({"video_id": video_id, "chunk": i})
+
+    if VECTOR_STORE == "compact":
+        from compact_store import CompactVectorStore
+        texts = [doc.page_content for doc in documents]
+        store = CompactVectorStore.build(
+            _compact_path(video_id), texts, get_embeddings().embed_documents(texts), dtype=COMPACT_STORE_DTYPE
+        )
+        return CompactVideoIndex(store, video_id)
+
+    from langchain_community.vectorstores import Chroma
     vectordb = Chroma.from_documents(
         documents=documents,
-        embedding=embedding_model,
-        persist_directory=persist_directory
+        embedding=get_embeddings(),
+        collection_name=video_collection_name(video_id),
+        **_chroma_kwargs(persist_directory)
     )
     vectordb.persist()
     return vectordb
\ No newline at end of file
@@ -4,7 +4,7 @@ import { useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 
-export default function RAGQuery({ transcript }: { transcript: string }) {
+export default function RAGQuery({ transcriptId }: { transcriptId: string }) {
   const [question, setQuestion] = useState('');
   const [ragAnswer, setRagAnswer] = useState<string>('');
   const [loading, setLoading] = useState(false);
@@ -17,7 +17,8 @@ export default function RAGQuery({ transcript }: { transcript: string }) {
       const res = await fetch(`${base}/rag`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ transcript, query: question }),
+        // The server keeps the transcript; only its id goes over the wire
+        body: JSON.stringify({ transcript_id: transcriptId, query: question }),
       });
       const data = await res.json();
       setRagAnswer(data.answer || 'No answer returned.');